@@ -1,16 +1,127 @@
+import asyncio
+import csv
 import discord
+import io
+import tempfile
+import zipfile
 
-from redbot.core import app_commands, commands
+from collections import OrderedDict
+from redbot.core import app_commands, checks, commands
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils.chat_formatting import bold, error
-from typing import Optional
+from redbot.core.utils.chat_formatting import bold, box, error, humanize_number
+from typing import Optional, Union
+
+from .sheet import render_sheet
 
 _ = Translator("Avatar", __file__)
+CACHE_SIZE = 32 * 1024 * 1024
+EXPORT_CONCURRENCY = 8
+SHEET_CACHE = 16
+SHEET_COLUMNS = 10
+SHEET_MAX = 200
+SHEET_RENDERS = 2
+SHEET_TILE = 128
+INDEX_HEADER = ["id", "user", "display_name", "file"]
+INDEX_NAME = "index.csv"
+# fixed sizes of the zip records, without the file name
+ZIP_LOCAL_HEADER = 30
+ZIP_DIRECTORY_ENTRY = 46
+ZIP_END_RECORD = 22
+
+class AvatarCache:
+	"""LRU cache of avatar images, bounded by their total size in bytes.
+
+	Avatars are addressed by an immutable hash, so a cached image never goes stale."""
+
+	def __init__(self, maxsize: int) -> None:
+		self.maxsize = maxsize
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self.entries = OrderedDict()
+
+	async def read(self, asset: discord.Asset, ext: str) -> bytes:
+		key = (asset.key, ext)
+		if (data := self.entries.get(key)) is not None:
+			self.hits += 1
+			self.entries.move_to_end(key)
+			return data
+
+		self.misses += 1
+		data = await asset.read()
+		if len(data) <= self.maxsize:
+			self.entries[key] = data
+			self.size += len(data)
+			while self.size > self.maxsize:
+				self.size -= len(self.entries.popitem(last=False)[1])
+		return data
+
+class AvatarArchive:
+	"""Zip archives on temporary files, starting a new part before one would exceed the size limit.
+
+	Every part has an `index.csv` listing which members use which file."""
+
+	def __init__(self, limit: int) -> None:
+		self.limit = limit
+		self.parts = []
+		self.fp = None
+		self.zip = None
+		self.index = []
+		self.csv_size = 0
+		self.directory = 0
+
+	@staticmethod
+	def csv_rows(rows: list) -> str:
+		text = io.StringIO()
+		csv.writer(text).writerows(rows)
+		return text.getvalue()
+
+	def add(self, filename: str, data: bytes, members: list) -> None:
+		rows = [[member.id, str(member), member.display_name, filename] for member in members]
+		rows_size = len(self.csv_rows(rows).encode())
+		name_size = len(filename.encode())
+		if self.zip:
+			# the part as it would be closed after this file: the file and the index with their local headers,
+			# a central directory entry for every file, and the end of central directory record
+			size = (
+				self.fp.tell() + ZIP_LOCAL_HEADER + name_size + len(data)
+				+ ZIP_LOCAL_HEADER + len(INDEX_NAME) + self.csv_size + rows_size
+				+ self.directory + ZIP_DIRECTORY_ENTRY + name_size + ZIP_DIRECTORY_ENTRY + len(INDEX_NAME) + ZIP_END_RECORD
+			)
+			if size > self.limit:
+				self.close_part()
+		if not self.zip:
+			self.fp = tempfile.TemporaryFile()
+			self.zip = zipfile.ZipFile(self.fp, "w", zipfile.ZIP_STORED)
+			self.csv_size = len(self.csv_rows([INDEX_HEADER]).encode())
+			self.directory = 0
+		self.zip.writestr(filename, data)
+		self.index.extend(rows)
+		self.csv_size += rows_size
+		self.directory += ZIP_DIRECTORY_ENTRY + name_size
+
+	def close_part(self) -> None:
+		self.zip.writestr(INDEX_NAME, self.csv_rows([INDEX_HEADER, *self.index]))
+		self.zip.close()
+		self.fp.seek(0)
+		self.parts.append(self.fp)
+		self.fp = self.zip = None
+		self.index = []
+
+	def close(self) -> list:
+		if self.zip:
+			self.close_part()
+		return self.parts
 
 @cog_i18n(_)
 class Avatar(commands.Cog):
 	"""Get a user's avatar."""
 
+	def __init__(self) -> None:
+		self.cache = AvatarCache(CACHE_SIZE)
+		self.sheets = OrderedDict()
+		self.renders = asyncio.Semaphore(SHEET_RENDERS)
+
 	@commands.hybrid_command(name="avatar", description="Get a user's avatar")
 	@app_commands.describe(user="The user you wish to retrieve the avatar of")
 	@app_commands.guild_only()
@@ -32,11 +143,104 @@ class Avatar(commands.Cog):
 			async with ctx.typing():
 				pfp = user.avatar if isinstance(ctx.channel, discord.channel.DMChannel) else user.display_avatar
 				fileExt = "gif" if pfp and pfp.is_animated() else "png"
-			return await ctx.send(message, file=await pfp.to_file(filename=f"pfp-{user.id}.{fileExt}"))
+				data = await self.cache.read(pfp, fileExt)
+			return await ctx.send(message, file=discord.File(io.BytesIO(data), filename=f"pfp-{user.id}.{fileExt}"))
 		elif ctx.channel.permissions_for(ctx.guild.me).embed_links:
 			return await ctx.send(message + "\n" + user.display_avatar.url)
 
 		await ctx.send(error(_("I do not have permission to attach files or embed links in this channel.")), ephemeral=True)
 
+	@checks.mod_or_permissions(manage_guild=True)
+	@commands.guild_only()
+	@commands.command()
+	async def avatarexport(self, ctx: commands.Context, *targets: Union[discord.Role, discord.Member]) -> None:
+		"""Export the avatars of members as zip archive.
+
+		Targets can be roles and members. Without targets, the avatars of all members of this server are exported.
+
+		Identical avatars are only included once, and archives over the upload limit are split into parts."""
+		if not ctx.channel.permissions_for(ctx.guild.me).attach_files:
+			return await ctx.send(error(_("I do not have permission to attach files in this channel.")))
+
+		members = self.get_members(targets or [ctx.guild.default_role])
+		avatars = {}
+		for member in members.values():
+			pfp = member.display_avatar
+			fileExt = "gif" if pfp.is_animated() else "png"
+			avatars.setdefault(f"{pfp.key}.{fileExt}", (pfp, []))[1].append(member)
+
+		archive = AvatarArchive(ctx.guild.filesize_limit)
+		semaphore = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+		async def download(filename: str, pfp: discord.Asset, owners: list) -> tuple:
+			async with semaphore:
+				return filename, await pfp.read(), owners
+
+		async with ctx.typing():
+			for task in asyncio.as_completed([download(filename, pfp, owners) for filename, (pfp, owners) in avatars.items()]):
+				try:
+					archive.add(*await task)
+				except discord.HTTPException:
+					continue
+			parts = archive.close()
+
+		message = _("Exported {avatars} avatars of {members} members.").format(avatars=humanize_number(len(avatars)), members=humanize_number(len(members)))
+		for count, fp in enumerate(parts, start=1):
+			filename = f"avatars-{ctx.guild.id}.zip" if len(parts) == 1 else f"avatars-{ctx.guild.id}-{count}.zip"
+			with fp:
+				await ctx.send(message if count == 1 else None, file=discord.File(fp, filename=filename))
+
+	@commands.guild_only()
+	@commands.command()
+	async def avatarsheet(self, ctx: commands.Context, *targets: Union[discord.Role, discord.Member]) -> None:
+		"""Show the avatars of members side by side in a single image.
+
+		Targets can be roles and members. A sheet holds at most 200 avatars."""
+		if not targets:
+			return await ctx.send_help()
+		if not ctx.channel.permissions_for(ctx.guild.me).attach_files:
+			return await ctx.send(error(_("I do not have permission to attach files in this channel.")))
+
+		members = sorted(self.get_members(targets).values(), key=lambda m: m.display_name.lower())[:SHEET_MAX]
+		if not members:
+			return await ctx.send(error(_("There are no members to show.")))
+		key = tuple((member.display_avatar.key, member.display_name) for member in members)
+		async with ctx.typing():
+			if (data := self.sheets.get(key)) is None:
+				semaphore = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+				async def download(member: discord.Member) -> bytes:
+					async with semaphore:
+						return await member.display_avatar.with_size(SHEET_TILE).with_static_format("png").read()
+
+				images = await asyncio.gather(*(download(member) for member in members))
+				labels = [member.display_name for member in members]
+				# Pillow releases the GIL while decoding and resizing, so a thread keeps the event loop responsive
+				async with self.renders:
+					data = await asyncio.get_running_loop().run_in_executor(None, render_sheet, images, labels, SHEET_TILE, SHEET_COLUMNS)
+				self.sheets[key] = data
+				while len(self.sheets) > SHEET_CACHE:
+					self.sheets.popitem(last=False)
+			self.sheets.move_to_end(key)
+		await ctx.send(file=discord.File(io.BytesIO(data), filename=f"avatars-{ctx.guild.id}.png"))
+
+	def get_members(self, targets: list) -> dict:
+		members = {}
+		for target in targets:
+			for member in target.members if isinstance(target, discord.Role) else [target]:
+				members[member.id] = member
+		return members
+
+	@checks.is_owner()
+	@commands.command(hidden=True)
+	async def avatarcache(self, ctx: commands.Context) -> None:
+		"""Show the usage of the avatar cache."""
+		requests = self.cache.hits + self.cache.misses
+		await ctx.send(box("\n".join([
+			_("Cached avatars: {count}").format(count=humanize_number(len(self.cache.entries))),
+			_("Cache size: {size} of {maxsize} bytes").format(size=humanize_number(self.cache.size), maxsize=humanize_number(self.cache.maxsize)),
+			_("Hits: {hits} / Misses: {misses} ({rate:.1%})").format(hits=self.cache.hits, misses=self.cache.misses, rate=self.cache.hits / requests if requests else 0),
+		])))
+
 	async def red_delete_data_for_user(self, **kwargs) -> None:
 		pass
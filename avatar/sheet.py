@@ -0,0 +1,24 @@
+import io
+
+from PIL import Image, ImageDraw, ImageFont
+
+LABEL_HEIGHT = 16
+BACKGROUND = (47, 49, 54, 255)
+
+def render_sheet(images: list, labels: list, tile: int, columns: int) -> bytes:
+	"""Composite avatars into a grid with their names below them, and return it as PNG.
+
+	Runs in an executor thread, so it only takes and returns plain data."""
+	rows = -(-len(images) // columns)
+	sheet = Image.new("RGBA", (min(len(images), columns) * tile, rows * (tile + LABEL_HEIGHT)), BACKGROUND)
+	draw = ImageDraw.Draw(sheet)
+	font = ImageFont.load_default()
+	for i, (data, label) in enumerate(zip(images, labels)):
+		x, y = (i % columns) * tile, (i // columns) * (tile + LABEL_HEIGHT)
+		with Image.open(io.BytesIO(data)) as image:
+			sheet.paste(image.convert("RGBA").resize((tile, tile)), (x, y))
+		draw.text((x + 2, y + tile + 2), label[:tile // 7], font=font, fill=(255, 255, 255, 255))
+
+	out = io.BytesIO()
+	sheet.save(out, "PNG")
+	return out.getvalue()
@@ -0,0 +1,32 @@
+import re
+
+DOMAIN_REGEX = re.compile(r"!?(\*\.)?[a-z0-9-]+(\.[a-z0-9-]+)*")
+EXACT, WILDCARD = 0, 1  # keys that can't collide with labels
+
+class DomainMatcher:
+	"""Suffix trie over reversed domain labels.
+
+	Rules are either a plain host (`youtube.com`), a wildcard for all of its subdomains (`*.youtube.com`), or either of those prefixed with `!` to exempt them.
+	The most specific rule wins, and a lookup takes time proportional to the number of labels in the host."""
+	__slots__ = ('root',)
+
+	def __init__(self, rules: list) -> None:
+		self.root = {}
+		for rule in rules:
+			verdict = not rule.startswith("!")
+			rule = rule.lstrip("!")
+			wildcard = rule.startswith("*.")
+			node = self.root
+			for label in reversed(rule[2:].split(".") if wildcard else rule.split(".")):
+				node = node.setdefault(label, {})
+			node[WILDCARD if wildcard else EXACT] = verdict
+
+	def match(self, host: str) -> bool:
+		node = self.root
+		verdict = False
+		for label in reversed(host.split(".")):
+			if WILDCARD in node:
+				verdict = node[WILDCARD]
+			if (node := node.get(label)) is None:
+				return verdict
+		return node.get(EXACT, verdict)
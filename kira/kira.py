@@ -1,18 +1,66 @@
+import asyncio
 import discord
 import logging
-import re
+import time
 
+from collections import OrderedDict
 from contextlib import suppress
+from discord.ext import tasks
 from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils.chat_formatting import bold, error, humanize_list, success, underline, warning
+from redbot.core.utils.chat_formatting import bold, error, humanize_list, inline, success, underline, warning
 from redbot.core.utils.views import ConfirmView
 from typing import Optional, NoReturn
-from urllib.parse import urlparse
+
+from .domains import DOMAIN_REGEX, DomainMatcher
+from .links import find_links
 
 _ = Translator("KirA", __file__)
 log = logging.getLogger("red.mr42-cogs.kira")
+WHEEL_SIZE = 64
+VERDICT_CACHE_SIZE = 10000
+VIEW_TIMEOUT = 7 * 24 * 3600  # only to satisfy the check of ConfirmView, the timer wheel expires questions
+
+class Question(ConfirmView):
+	"""Confirmation prompt that hands its answer to the cog instead of being awaited."""
+
+	def __init__(self, cog: "KirA", origin: discord.Message, links: list, trust: int) -> None:
+		super().__init__(origin.author, timeout=VIEW_TIMEOUT)
+		# without a timeout discord.py starts no timer task per prompt
+		self.timeout = None
+		self.cog = cog
+		self.origin = origin
+		self.links = links
+		self.trust = trust
+		self.rounds = 0
+
+	def stop(self) -> None:
+		super().stop()
+		if self.result is not None:
+			self.cog.answer(self)
+
+class VerdictCache:
+	"""Bounded LRU of confirmed verdicts, each expiring after its own trust window."""
+
+	def __init__(self, size: int) -> None:
+		self.size = size
+		self.entries = OrderedDict()
+
+	def __contains__(self, key: tuple) -> bool:
+		if (expiry := self.entries.get(key)) is None:
+			return False
+		if expiry < time.monotonic():
+			del self.entries[key]
+			return False
+		self.entries.move_to_end(key)
+		return True
+
+	def add(self, key: tuple, ttl: int) -> None:
+		self.entries[key] = time.monotonic() + ttl
+		self.entries.move_to_end(key)
+		while len(self.entries) > self.size:
+			self.entries.popitem(last=False)
 
 @cog_i18n(_)
 class KirA(commands.Cog):
@@ -24,9 +72,18 @@ class KirA(commands.Cog):
 		default_channel_settings = {
 			'domains': ['youtu.be', 'youtube.com', 'www.youtube.com', 'music.youtube.com'],
 			'question': _('Are you sure this video is relevant to the topic?'),
-			'timeout': 10
+			'timeout': 10,
+			'trust': 0,
+			'trusted': []
 		}
 		self.config.register_channel(**default_channel_settings)
+		self.matchers = {}
+		self.watched = None
+		self.verdicts = VerdictCache(VERDICT_CACHE_SIZE)
+		self.questions = {}
+		self.tasks = set()
+		self.wheel = [set() for _ in range(WHEEL_SIZE)]
+		self.tick = 0
 
 	@commands.group()
 	async def kira(self, ctx: commands.Context) -> NoReturn:
@@ -52,6 +109,7 @@ class KirA(commands.Cog):
 			return await ctx.send(error(_("I don't have permission to {perm} in {channel}.").format(perm=humanize_list(perm), channel=channel.mention)))
 
 		await self.config.channel(channel).set({})
+		self.watched = None
 		await ctx.send(success(_("The channel {channel} will now be monitored for links.").format(channel=channel.mention)))
 
 	@checks.admin_or_permissions(manage_guild=True)
@@ -63,6 +121,8 @@ class KirA(commands.Cog):
 			return await ctx.send(warning(_("The channel {channel} is not being monitored.").format(channel=channel.mention)))
 
 		await self.config.channel(channel).clear()
+		self.matchers.pop(channel.id, None)
+		self.watched = None
 		await ctx.send(success(_("The channel {channel} will no longer be monitored for links.").format(channel=channel.mention)))
 
 	@checks.admin_or_permissions(manage_guild=True)
@@ -98,34 +158,176 @@ class KirA(commands.Cog):
 	@checks.admin_or_permissions(manage_guild=True)
 	@commands.guild_only()
 	@kira.command()
-	async def domain(self, ctx: commands.Context, channel: discord.TextChannel) -> None:
+	async def trust(self, ctx: commands.Context, channel: discord.TextChannel, minutes: Optional[int]) -> None:
+		"""Set how long a confirmed link is trusted. During this time, the sender won't be questioned again for the same video or domain.
+
+		Default is 0 minutes, which disables this."""
+		if channel.id not in await self.config.all_channels():
+			return await ctx.send(warning(_("The channel {channel} is not being monitored.").format(channel=channel.mention)))
+
+		t = abs(minutes) if minutes is not None else await self.config.channel(channel).trust() // 60
+		text = _("1 minute") if t == 1 else _("{time} minutes").format(time=t)
+
+		if minutes is None:
+			return await ctx.send(_("Confirmed links are currently trusted for {time}.").format(time=bold(text)))
+
+		await self.config.channel(channel).trust.set(t * 60)
+		await ctx.send(success(_("Confirmed links will be trusted for {time}.").format(time=bold(text))))
+
+	@checks.admin_or_permissions(manage_guild=True)
+	@commands.guild_only()
+	@kira.command()
+	async def trustrole(self, ctx: commands.Context, channel: discord.TextChannel, role: discord.Role) -> None:
+		"""Toggle a role whose members are never questioned."""
+		if channel.id not in await self.config.all_channels():
+			return await ctx.send(warning(_("The channel {channel} is not being monitored.").format(channel=channel.mention)))
+
+		async with self.config.channel(channel).trusted() as trusted:
+			if added := role.id not in trusted:
+				trusted.append(role.id)
+			else:
+				trusted.remove(role.id)
+
+		msg = _("Members of {role} will no longer be questioned in {channel}.") if added else _("Members of {role} will be questioned again in {channel}.")
+		await ctx.send(success(msg.format(role=bold(role.name), channel=channel.mention)))
+
+	@checks.admin_or_permissions(manage_guild=True)
+	@commands.guild_only()
+	@kira.group()
+	async def domain(self, ctx: commands.Context) -> NoReturn:
 		"""Configure which domains to look out for.
 
-		This function doesn't do anything at the moment, but will be expanded later."""
+		Domains match exactly, `*.example.com` matches all subdomains of example.com, and a leading `!` exempts a domain or wildcard.
+		The most specific rule wins."""
+
+	@domain.command(name="list")
+	async def domain_list(self, ctx: commands.Context, channel: discord.TextChannel) -> None:
+		"""Show the domains to look out for."""
 		if channel.id not in await self.config.all_channels():
 			return await ctx.send(warning(_("The channel {channel} is not being monitored.").format(channel=channel.mention)))
 
 		domains = await self.config.channel(channel).domains()
-		await ctx.send(_("Current configured domains: {domains}").format(domains=humanize_list(domains)))
+		await ctx.send(_("Current configured domains: {domains}").format(domains=humanize_list([inline(x) for x in domains])))
+
+	@domain.command(name="add")
+	async def domain_add(self, ctx: commands.Context, channel: discord.TextChannel, *domains: str) -> None:
+		"""Add domains to look out for."""
+		await self.update_domains(ctx, channel, domains, add=True)
+
+	@domain.command(name="remove")
+	async def domain_remove(self, ctx: commands.Context, channel: discord.TextChannel, *domains: str) -> None:
+		"""Stop looking out for domains."""
+		await self.update_domains(ctx, channel, domains, add=False)
+
+	async def update_domains(self, ctx: commands.Context, channel: discord.TextChannel, domains: tuple, add: bool) -> None:
+		if channel.id not in await self.config.all_channels():
+			return await ctx.send(warning(_("The channel {channel} is not being monitored.").format(channel=channel.mention)))
+		if not domains:
+			return await ctx.send_help()
+
+		domains = [x.lower().strip(".") for x in domains]
+		if fail := [inline(x) for x in domains if not DOMAIN_REGEX.fullmatch(x)]:
+			return await ctx.send(error(_("Invalid domain: {domains}").format(domains=humanize_list(fail))))
+
+		async with self.config.channel(channel).domains() as current:
+			for domain in domains:
+				if add and domain not in current:
+					current.append(domain)
+				elif not add and domain in current:
+					current.remove(domain)
+			updated = list(current)
+		self.matchers.pop(channel.id, None)
+
+		msg = _("Domains for {channel} have been updated: {domains}") if updated else _("No domains are configured for {channel} anymore.")
+		await ctx.send(success(msg.format(channel=channel.mention, domains=humanize_list([inline(x) for x in updated]))))
+
+	async def get_matcher(self, channel: discord.TextChannel) -> DomainMatcher:
+		"""Return the compiled domains of a channel, which are only rebuilt after they change."""
+		if (matcher := self.matchers.get(channel.id)) is None:
+			matcher = self.matchers[channel.id] = DomainMatcher(await self.config.channel(channel).domains())
+		return matcher
+
+	async def get_watched(self) -> set:
+		"""Return the IDs of all monitored channels, without copying all their settings from Config for every message."""
+		if self.watched is None:
+			self.watched = set(await self.config.all_channels())
+		return self.watched
 
 	@commands.Cog.listener()
 	async def on_message(self, message: discord.Message) -> None:
-		if not message.author.bot and message.channel.id in await self.config.all_channels() and message.author != message.guild.owner:
-			for link in re.findall(r'(https?://\S+/)', message.content):
-				if urlparse(link).hostname in await self.config.channel(message.channel).domains():
-					timeout = await self.config.channel(message.channel).timeout()
-					if timeout and message.channel.permissions_for(message.guild.me).manage_messages:
-						prompt = await self.config.channel(message.channel).question()
-						view = ConfirmView(message.author, timeout=timeout)
-						view.message = await message.reply(prompt, view=view)
-						await view.wait()
-						with suppress(discord.NotFound):
-							await view.message.delete()
-
-						if view.result:
-							return
-					with suppress(discord.NotFound):
-						return await message.delete()
+		if not message.author.bot and message.channel.id in await self.get_watched() and message.author != message.guild.owner:
+			matcher = await self.get_matcher(message.channel)
+			if links := [(message.channel.id, message.author.id, yid or host) for host, yid in find_links(message) if matcher.match(host)]:
+				if all(link in self.verdicts for link in links):
+					return
+				trusted = await self.config.channel(message.channel).trusted()
+				if any(role.id in trusted for role in message.author.roles):
+					return
+
+				timeout = await self.config.channel(message.channel).timeout()
+				if timeout and message.channel.permissions_for(message.guild.me).manage_messages:
+					prompt = await self.config.channel(message.channel).question()
+					view = Question(self, message, links, await self.config.channel(message.channel).trust())
+					view.message = await message.reply(prompt, view=view)
+					return self.ask(view, timeout)
+				with suppress(discord.NotFound):
+					await message.delete()
+
+	def ask(self, view: Question, timeout: int) -> None:
+		"""Register a pending question on the timer wheel, which expires it after `timeout` seconds."""
+		self.questions[view.message.id] = view
+		view.rounds, slot = divmod(timeout - 1, WHEEL_SIZE)
+		self.wheel[(self.tick + slot + 1) % WHEEL_SIZE].add(view.message.id)
+		if not self.expire_questions.is_running():
+			self.expire_questions.start()
+
+	def answer(self, view: Question) -> None:
+		if self.questions.pop(view.message.id, None):
+			if view.result and view.trust:
+				for link in view.links:
+					self.verdicts.add(link, view.trust)
+			self.create_task(self.resolve(view))
+
+	def create_task(self, coro) -> None:
+		"""Run a coroutine in the background, keeping a reference until it is done."""
+		task = asyncio.create_task(coro)
+		self.tasks.add(task)
+		task.add_done_callback(self.tasks.discard)
+
+	async def resolve(self, view: Question) -> None:
+		"""Remove the prompt, and the questioned message unless the sender confirmed it."""
+		with suppress(discord.NotFound):
+			await view.message.delete()
+		if not view.result:
+			with suppress(discord.NotFound):
+				await view.origin.delete()
+
+	@tasks.loop(seconds=1)
+	async def expire_questions(self) -> None:
+		self.tick = (self.tick + 1) % WHEEL_SIZE
+		expired = []
+		for prompt in list(self.wheel[self.tick]):
+			if not (view := self.questions.get(prompt)):
+				self.wheel[self.tick].discard(prompt)
+			elif view.rounds:
+				view.rounds -= 1
+			else:
+				self.wheel[self.tick].discard(prompt)
+				expired.append(self.questions.pop(prompt))
+
+		for view in expired:
+			view.stop()
+		await asyncio.gather(*(self.resolve(view) for view in expired), return_exceptions=True)
 
 	async def red_delete_data_for_user(self, **kwargs) -> None:
 		pass
+
+	def cog_unload(self):
+		self.expire_questions.cancel()
+		for view in self.questions.values():
+			view.stop()
+			self.create_task(self.delete_prompt(view))
+
+	async def delete_prompt(self, view: Question) -> None:
+		with suppress(discord.NotFound):
+			await view.message.delete()
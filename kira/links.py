@@ -0,0 +1,29 @@
+import re
+
+from typing import Optional
+
+URL_REGEX = re.compile(r"https?://(?:[^\s/@<>]*@)?([^\s/?#:<>]+)(?::\d+)?(/[^\s?#<>]*)?(?:\?([^\s#<>]*))?", re.IGNORECASE)
+SHORT_PATH = re.compile(r"/([-_A-Za-z0-9]{11})(?![-_A-Za-z0-9])")
+VIDEO_PATH = re.compile(r"/(?:watch|shorts|live|embed|v)/([-_A-Za-z0-9]{11})(?![-_A-Za-z0-9])")
+VIDEO_QUERY = re.compile(r"(?:^|&)v=([-_A-Za-z0-9]{11})(?![-_A-Za-z0-9])")
+YOUTUBE_HOSTS = frozenset({'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com'})
+
+def find_links(message) -> list:
+	"""Return the (host, video ID) of every link in the content and embeds of a message, without duplicates.
+
+	The video ID is None for links that don't point to a YouTube video."""
+	links = {}
+	for text in (message.content, *(embed.url for embed in message.embeds)):
+		if text:
+			for match in URL_REGEX.finditer(text):
+				links.setdefault(parse_link(*match.groups()))
+	return list(links)
+
+def parse_link(host: str, path: Optional[str], query: Optional[str]) -> tuple:
+	host = host.lower().rstrip('.')
+	match = None
+	if host == 'youtu.be':
+		match = SHORT_PATH.match(path or "")
+	elif host in YOUTUBE_HOSTS:
+		match = VIDEO_QUERY.search(query or "") if path == '/watch' else VIDEO_PATH.match(path or "")
+	return host, match[1] if match else None
@@ -0,0 +1,220 @@
+import asyncio
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+
+from discord.ext import tasks
+from redbot.core import Config, checks, commands
+from redbot.core.bot import Red
+from redbot.core.i18n import Translator, cog_i18n
+from redbot.core.utils.chat_formatting import bold, box, error, inline, pagify, success, text_to_file, warning
+from typing import Callable, NoReturn, Optional
+
+_ = Translator("Profiler", __file__)
+log = logging.getLogger("red.mr42-cogs.profiler")
+PROFILE_TIMEOUT = 3600
+TOP_ENTRIES = 40
+
+class Session:
+	"""Profiles the next calls of a background loop or listener.
+
+	The profiler runs from the start of a call until its end, so it also sees whatever else the event loop runs while the call awaits."""
+
+	def __init__(self, target: str, mode: str, calls: int, budget: int) -> None:
+		self.target = target
+		self.mode = mode
+		self.remaining = calls
+		self.budget = budget
+		self.durations = []
+		self.slow = []
+		self.active = 0
+		self.profile = cProfile.Profile() if mode == "cpu" else None
+		self.traced = False
+		self.snapshot = None
+		self.done = asyncio.Event()
+		self.restore = None
+
+	def wrap(self, func: Callable) -> Callable:
+		@functools.wraps(func)
+		async def wrapped(*args, **kwargs):
+			if self.remaining <= 0:
+				return await func(*args, **kwargs)
+			self.remaining -= 1
+			if not self.active:
+				self.start()
+			self.active += 1
+			start = time.perf_counter()
+			try:
+				return await func(*args, **kwargs)
+			finally:
+				ms = (time.perf_counter() - start) * 1000
+				self.active -= 1
+				if not self.active:
+					self.pause()
+				self.durations.append(ms)
+				if self.budget and ms > self.budget:
+					self.slow.append((len(self.durations), ms))
+					log.warning("%s took %.1f ms, which is over the budget of %d ms", self.target, ms, self.budget)
+				if self.remaining <= 0 and not self.active:
+					self.done.set()
+		return wrapped
+
+	def start(self) -> None:
+		if self.profile:
+			self.profile.enable()
+		elif not self.snapshot:
+			if not tracemalloc.is_tracing():
+				tracemalloc.start()
+				self.traced = True
+			self.snapshot = tracemalloc.take_snapshot()
+
+	def pause(self) -> None:
+		if self.profile:
+			self.profile.disable()
+
+	def close(self) -> None:
+		if self.restore:
+			self.restore()
+			self.restore = None
+		if self.active:
+			self.active = 0
+			self.pause()
+		if self.traced:
+			tracemalloc.stop()
+			self.traced = False
+
+	def report(self) -> str:
+		lines = [f"{self.target}: {len(self.durations)} calls"]
+		if self.durations:
+			lines.append(f"mean {sum(self.durations) / len(self.durations):.1f} ms, max {max(self.durations):.1f} ms")
+		for number, ms in self.slow:
+			lines.append(f"call {number} took {ms:.1f} ms, over the budget of {self.budget} ms")
+		lines.append("")
+
+		if self.profile and self.durations:
+			stream = io.StringIO()
+			pstats.Stats(self.profile, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_ENTRIES)
+			lines.append(stream.getvalue())
+		elif self.snapshot and tracemalloc.is_tracing():
+			for stat in tracemalloc.take_snapshot().compare_to(self.snapshot, "lineno")[:TOP_ENTRIES]:
+				lines.append(str(stat))
+		return "\n".join(lines)
+
+@cog_i18n(_)
+class Profiler(commands.Cog):
+	"""Profile background loops and listeners of loaded cogs."""
+
+	def __init__(self, bot: Red) -> None:
+		self.bot = bot
+		self.config = Config.get_conf(self, identifier=823288853745238067)
+		self.config.register_global(budget=250)
+		self.session = None
+
+	@checks.is_owner()
+	@commands.group()
+	async def profile(self, ctx: commands.Context) -> NoReturn:
+		"""Profile background loops and listeners of loaded cogs.
+
+		Targets are written as `Cog.name`, e.g. `YouTube.background_get_new_videos` or `KirA.on_message`."""
+
+	@profile.command(name="list")
+	async def profile_list(self, ctx: commands.Context) -> None:
+		"""List the loops and listeners that can be profiled."""
+		lines = []
+		for name, cog in sorted(self.bot.cogs.items()):
+			for attr, _value in inspect.getmembers(type(cog), lambda x: isinstance(x, tasks.Loop)):
+				lines.append(f"{name}.{attr} (loop)")
+			for event, attr in sorted(set(cog.__cog_listeners__)):
+				lines.append(f"{name}.{attr} ({event})")
+		for page in pagify("\n".join(lines)):
+			await ctx.send(box(page))
+
+	@profile.command()
+	async def cpu(self, ctx: commands.Context, target: str, calls: int = 1) -> None:
+		"""Profile the next calls of a loop or listener with cProfile, and send the hottest functions as a file."""
+		await self.run_session(ctx, target, "cpu", calls)
+
+	@profile.command()
+	async def memory(self, ctx: commands.Context, target: str, calls: int = 1) -> None:
+		"""Trace the memory allocated during the next calls of a loop or listener, and send the largest allocation sites as a file."""
+		await self.run_session(ctx, target, "memory", calls)
+
+	@profile.command()
+	async def stop(self, ctx: commands.Context) -> None:
+		"""Stop the running profiler and send what it collected so far."""
+		if not self.session:
+			return await ctx.send(error(_("The profiler is not running.")))
+		self.session.done.set()
+
+	@profile.command()
+	async def budget(self, ctx: commands.Context, milliseconds: Optional[int]) -> None:
+		"""Set the time a single profiled call may take before a warning is logged.
+
+		Use 0 to disable the warnings. Default is 250 milliseconds."""
+		if milliseconds is None:
+			milliseconds = await self.config.budget()
+			return await ctx.send(_("The budget for a single call is {budget}.").format(budget=bold(f"{milliseconds} ms")))
+		await self.config.budget.set(max(milliseconds, 0))
+		await ctx.send(success(_("The budget for a single call is now {budget}.").format(budget=bold(f"{max(milliseconds, 0)} ms"))))
+
+	async def run_session(self, ctx: commands.Context, target: str, mode: str, calls: int) -> None:
+		if self.session:
+			return await ctx.send(error(_("The profiler is already running for {target}.").format(target=inline(self.session.target))))
+
+		session = Session(target, mode, max(calls, 1), await self.config.budget())
+		if not self.patch(target, session):
+			return await ctx.send(error(_("{target} is not a loop or listener of a loaded cog.").format(target=inline(target))))
+
+		self.session = session
+		await ctx.send(success(_("Profiling the next {calls} calls of {target}…").format(calls=session.remaining, target=inline(target))))
+		try:
+			await asyncio.wait_for(session.done.wait(), PROFILE_TIMEOUT)
+		except asyncio.TimeoutError:
+			await ctx.send(warning(_("The profiler timed out before all calls were made.")))
+		finally:
+			report = session.report()
+			session.close()
+			self.session = None
+		await ctx.send(file=text_to_file(report, f"profile-{mode}-{target}.txt"))
+
+	def patch(self, target: str, session: Session) -> bool:
+		"""Wrap a loop or listener of a loaded cog, and give the session a way to restore it."""
+		cog_name, _sep, attr = target.partition(".")
+		if not (cog := self.bot.get_cog(cog_name)) or not attr:
+			return False
+
+		if isinstance(loop := getattr(cog, attr, None), tasks.Loop):
+			original = loop.coro
+			loop.coro = session.wrap(original)
+			session.restore = lambda: setattr(loop, 'coro', original)
+			return True
+
+		for event in {event for event, name in cog.__cog_listeners__ if name == attr}:
+			listeners = self.bot.extra_events.get(event, [])
+			bound = getattr(cog, attr)
+			if bound in listeners:
+				wrapped = session.wrap(bound)
+				listeners[listeners.index(bound)] = wrapped
+
+				def restore() -> None:
+					if wrapped in listeners:
+						listeners.remove(wrapped)
+						# don't bring back the listener of a cog that was unloaded meanwhile
+						if self.bot.get_cog(cog_name) is cog:
+							listeners.append(bound)
+				session.restore = restore
+				return True
+		return False
+
+	async def red_delete_data_for_user(self, **kwargs) -> None:
+		pass
+
+	def cog_unload(self):
+		if self.session:
+			self.session.done.set()
+			self.session.close()
@@ -0,0 +1,39 @@
+import re
+
+from bisect import bisect_left
+from collections import defaultdict
+
+WORD_REGEX = re.compile(r"[a-z0-9]+")
+
+class CogIndex:
+	"""Inverted index from the words in cog names, short descriptions and tags to the `(repo name, cog name)` of the cogs using them.
+
+	Query words match by prefix, and a cog has to match all of them."""
+	__slots__ = ('version', 'postings', 'words')
+
+	def __init__(self, repos: list) -> None:
+		self.version = self.get_version(repos)
+		self.postings = defaultdict(set)
+		for repo in repos:
+			for cog in repo.available_cogs:
+				for text in (cog.name, cog.short or "", *cog.tags):
+					for word in WORD_REGEX.findall(text.lower()):
+						self.postings[word].add((repo.name, cog.name))
+		self.words = sorted(self.postings)
+
+	@staticmethod
+	def get_version(repos: list) -> frozenset:
+		return frozenset((repo.name, repo.commit) for repo in repos)
+
+	def search(self, query: str) -> set:
+		result = None
+		for term in WORD_REGEX.findall(query.lower()):
+			matches = set()
+			i = bisect_left(self.words, term)
+			while i < len(self.words) and self.words[i].startswith(term):
+				matches |= self.postings[self.words[i]]
+				i += 1
+			result = matches if result is None else result & matches
+			if not result:
+				break
+		return result or set()
@@ -1,18 +1,38 @@
+import asyncio
+import os
+import time
+
+from collections import defaultdict
+from datetime import datetime, timezone
 from inspect import getfile
 from redbot.core import checks, commands
 from redbot.core.bot import Red
 from redbot.core.i18n import Translator
 from redbot.core.utils.chat_formatting import box, pagify
+from typing import Optional
+
+from .index import CogIndex
+
+FRESHNESS_CONCURRENCY = 8
+FRESHNESS_TIMEOUT = 60
+FRESHNESS_TTL = 300
 
 class RepoList(commands.Cog):
 	"""List all installed repos and their available cogs in one command."""
 	def __init__(self, bot: Red) -> None:
 		self.bot = bot
+		self.pages = {}  # repo name -> (commit and installed cogs, rendered pages)
+		self.index = None
+		self.freshness = {}  # repo name -> (checked at, status)
 
 	@checks.is_owner()
 	@commands.command()
-	async def repolist(self, ctx: commands.Context) -> None:
-		"""List all installed repos and their available cogs."""
+	async def repolist(self, ctx: commands.Context, *, query: str = "") -> None:
+		"""List all installed repos and their available cogs.
+
+		The query searches cog names, descriptions and tags, and can be narrowed down with:
+		- `repo:<name>` to only show one repo
+		- `is:installed` or `is:available` to only show installed or available cogs"""
 		cog = self.bot.get_cog("Downloader")
 		_ = Translator("Downloader", getfile(cog.__class__))
 		repos = cog._repo_manager.repos
@@ -20,38 +40,151 @@ class RepoList(commands.Cog):
 		if len(repos) == 0:
 			await ctx.send(box(_("There are no repos installed.")))
 		else:
-			for repo in sorted_repos:
-				sort_function = lambda x: x.name.lower()
-				all_installed_cogs = await cog.installed_cogs()
-				installed_cogs_in_repo = [cog for cog in all_installed_cogs if cog.repo_name == repo.name]
-				installed_str = "\n".join(
-					"- {}{}".format(i.name, ": {}".format(i.short) if i.short else "")
-					for i in sorted(installed_cogs_in_repo, key=sort_function)
-				)
-
-				if len(installed_cogs_in_repo) > 1:
-					installed_str = _("# Installed Cogs\n{text}").format(text=installed_str)
-				elif installed_cogs_in_repo:
-					installed_str = _("# Installed Cog\n{text}").format(text=installed_str)
-
-				available_cogs = [
-					cog for cog in repo.available_cogs if not (cog.hidden or cog in installed_cogs_in_repo)
-				]
-				available_str = "\n".join(
-					"+ {}{}".format(cog.name, ": {}".format(cog.short) if cog.short else "")
-					for cog in sorted(available_cogs, key=sort_function)
-				)
-
-				if not available_str:
-					cogs = _("> Available Cogs\nNo cogs are available.")
-				elif len(available_cogs) > 1:
-					cogs = _("> Available Cogs\n{text}").format(text=available_str)
+			words, repo_name, show = [], None, None
+			for word in query.split():
+				if word.lower().startswith("repo:"):
+					repo_name = word[5:].lower()
+				elif word.lower() in ("is:installed", "is:available"):
+					show = word[3:].lower()
 				else:
-					cogs = _("> Available Cog\n{text}").format(text=available_str)
-				header = "{}: {}\n{}".format(repo.name, repo.short or "", repo.url)
-				cogs = header + "\n\n" + cogs + "\n\n" + installed_str
-				for page in pagify(cogs, ["\n"], shorten_by=16):
-					await ctx.send(box(page.lstrip(" "), lang="markdown"))
+					words.append(word)
+			matches = None
+			if words:
+				if not self.index or self.index.version != CogIndex.get_version(repos):
+					self.index = CogIndex(repos)
+				matches = self.index.search(" ".join(words))
+
+			installed = defaultdict(dict)
+			for module in await cog.installed_cogs():
+				installed[module.repo_name][module.name] = module
+			sent = False
+			for repo in sorted_repos:
+				if repo_name and repo.name.lower() != repo_name:
+					continue
+				found = None if matches is None else {name for r, name in matches if r == repo.name}
+				for page in self.render_repo(repo, installed[repo.name], _, found, show):
+					await ctx.send(page)
+					sent = True
+			for name in self.pages.keys() - {repo.name for repo in repos}:
+				del self.pages[name]
+			if not sent:
+				await ctx.send(box(_("No cogs match your query.")))
+
+	@checks.is_owner()
+	@commands.command()
+	async def repostatus(self, ctx: commands.Context) -> None:
+		"""Check all installed repos for updates.
+
+		Shows how many commits each repo is behind and ahead of its remote, and when it was last changed.
+		Results are kept for 5 minutes."""
+		cog = self.bot.get_cog("Downloader")
+		_ = Translator("Downloader", getfile(cog.__class__))
+		repos = sorted(cog._repo_manager.repos, key=lambda r: str.lower(r.name))
+		if not repos:
+			return await ctx.send(box(_("There are no repos installed.")))
+
+		semaphore = asyncio.Semaphore(FRESHNESS_CONCURRENCY)
+		async with ctx.typing():
+			statuses = await asyncio.gather(*(self.get_freshness(repo, semaphore) for repo in repos))
+
+		width = max(len(repo.name) for repo in repos)
+		lines = []
+		for repo, status in zip(repos, statuses):
+			if status['behind'] is None:
+				line = _("no upstream branch")
+			else:
+				line = _("{behind:>4} behind {ahead:>4} ahead").format(behind=status['behind'], ahead=status['ahead'])
+			if status['date']:
+				line += "  " + _("last commit {date}").format(date=f"{datetime.fromtimestamp(status['date'], timezone.utc):%Y-%m-%d}")
+			if not status['fetched']:
+				line += "  " + _("(fetch failed)")
+			lines.append(f"{repo.name:<{width}}  {line}")
+		for page in pagify("\n".join(lines), ["\n"], shorten_by=16):
+			await ctx.send(box(page))
+
+	async def get_freshness(self, repo, semaphore: asyncio.Semaphore) -> dict:
+		"""Fetch a repo and count the commits between its checkout and upstream branch."""
+		if (cached := self.freshness.get(repo.name)) and time.monotonic() - cached[0] < FRESHNESS_TTL:
+			return cached[1]
+
+		# Downloader holds the repo lock while it updates or checks out the repo
+		async with semaphore, repo._repo_lock:
+			fetched = await self.git(repo.folder_path, "fetch", "--quiet") is not None
+			counts = await self.git(repo.folder_path, "rev-list", "--left-right", "--count", "HEAD...@{upstream}")
+			date = await self.git(repo.folder_path, "log", "-1", "--format=%ct", "HEAD")
+		ahead, behind = map(int, counts.split()) if counts else (None, None)
+		status = {'ahead': ahead, 'behind': behind, 'date': int(date) if date else None, 'fetched': fetched}
+		self.freshness[repo.name] = (time.monotonic(), status)
+		return status
+
+	async def git(self, path, *args) -> Optional[str]:
+		"""Run a git command in the given repo and return its output, or None when it failed."""
+		proc = await asyncio.create_subprocess_exec(
+			"git", "-C", str(path), *args,
+			stdout=asyncio.subprocess.PIPE,
+			stderr=asyncio.subprocess.DEVNULL,
+			env={**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+		)
+		try:
+			stdout = (await asyncio.wait_for(proc.communicate(), FRESHNESS_TIMEOUT))[0]
+		except asyncio.TimeoutError:
+			proc.kill()
+			await proc.wait()
+			return None
+		return stdout.decode().strip() if proc.returncode == 0 else None
+
+	def render_repo(self, repo, installed_cogs_in_repo: dict, _, found: Optional[set] = None, show: Optional[str] = None) -> list:
+		"""Render the pages for a repo, reusing them until its commit or the installed cogs change.
+
+		When filtered to the found cogs or to only installed or available cogs, nothing is cached and repos without any matches render no pages."""
+		key = (repo.commit, frozenset((name, module.commit) for name, module in installed_cogs_in_repo.items()))
+		filtered = found is not None or show is not None
+		if not filtered and (cached := self.pages.get(repo.name)) and cached[0] == key:
+			return cached[1]
+
+		available_cogs = [
+			cog for cog in repo.available_cogs if not (cog.hidden or cog.name in installed_cogs_in_repo)
+		]
+		if found is not None:
+			installed_cogs_in_repo = {name: module for name, module in installed_cogs_in_repo.items() if name in found}
+			available_cogs = [cog for cog in available_cogs if cog.name in found]
+		if show == "available":
+			installed_cogs_in_repo = {}
+		elif show == "installed":
+			available_cogs = []
+		if filtered and not (available_cogs or installed_cogs_in_repo):
+			return []
+
+		sort_function = lambda x: x.name.lower()
+		installed_str = "\n".join(
+			"- {}{}".format(i.name, ": {}".format(i.short) if i.short else "")
+			for i in sorted(installed_cogs_in_repo.values(), key=sort_function)
+		)
+
+		if len(installed_cogs_in_repo) > 1:
+			installed_str = _("# Installed Cogs\n{text}").format(text=installed_str)
+		elif installed_cogs_in_repo:
+			installed_str = _("# Installed Cog\n{text}").format(text=installed_str)
+
+		available_str = "\n".join(
+			"+ {}{}".format(cog.name, ": {}".format(cog.short) if cog.short else "")
+			for cog in sorted(available_cogs, key=sort_function)
+		)
+
+		if show == "installed":
+			cogs = ""
+		elif not available_str:
+			cogs = _("> Available Cogs\nNo cogs are available.")
+		elif len(available_cogs) > 1:
+			cogs = _("> Available Cogs\n{text}").format(text=available_str)
+		else:
+			cogs = _("> Available Cog\n{text}").format(text=available_str)
+		header = "{}: {}\n{}".format(repo.name, repo.short or "", repo.url)
+		cogs = header + "\n\n" + cogs + "\n\n" + installed_str
+		pages = [box(page.lstrip(" "), lang="markdown") for page in pagify(cogs, ["\n"], shorten_by=16)]
+		if not filtered:
+			self.pages[repo.name] = (key, pages)
+		return pages
 
 	async def red_delete_data_for_user(self, **kwargs) -> None:
 		pass
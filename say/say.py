@@ -1,20 +1,69 @@
 # Say by retke, aka El Laggron
+import aiohttp
 import asyncio
 import discord
+import heapq
+import io
 import logging
+import os
 import re
+import tempfile
+import time
 
 from contextlib import suppress
-from typing import Optional
-from redbot.core import app_commands, checks, commands
+from fnmatch import fnmatch
+from datetime import timedelta
+from typing import Optional, Union
+from redbot.core import Config, app_commands, checks, commands
 from redbot.core.bot import Red
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils.chat_formatting import bold, error, humanize_list, warning
-from redbot.core.utils.tunnel import Tunnel
+from redbot.core.utils.chat_formatting import bold, error, humanize_list, humanize_number, humanize_timedelta, inline, pagify, success, warning
 
 log = logging.getLogger("red.mr42-cogs.say")
 _ = Translator("Say", __file__)
 ROLE_MENTION_REGEX = re.compile(r"<@&(?P<id>[0-9]{17,19})>")
+SESSION_TIMEOUT = 300
+RELAY_WINDOW = 2
+RELAY_BUFFER = 100
+SPOOL_THRESHOLD = 2 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+BROADCAST_CONCURRENCY = 5
+SCHEDULE_MIN_INTERVAL = 60
+
+class ChannelPattern(commands.Converter):
+	"""Converts `match:<pattern>` to all text channels whose name matches the wildcard pattern."""
+
+	async def convert(self, ctx: commands.Context, argument: str) -> list:
+		if not argument.startswith("match:"):
+			raise commands.BadArgument()
+		return [x for x in ctx.guild.text_channels if fnmatch(x.name, argument[6:])]
+
+class RemoteTextChannel(commands.Converter):
+	"""Converts a channel mention or ID to a text channel of another server, if the author is an admin there."""
+
+	async def convert(self, ctx: commands.Context, argument: str) -> discord.TextChannel:
+		match = re.fullmatch(r"<#([0-9]{15,20})>|([0-9]{15,20})", argument)
+		channel = ctx.bot.get_channel(int(match[1] or match[2])) if match else None
+		if not isinstance(channel, discord.TextChannel):
+			raise commands.BadArgument()
+		if channel.guild != ctx.guild and not await ctx.bot.is_owner(ctx.author):
+			member = channel.guild.get_member(ctx.author.id)
+			if not member or not (await ctx.bot.is_admin(member) or channel.permissions_for(member).administrator):
+				raise commands.BadArgument()
+		return channel
+
+class Session:
+	"""An interact session, relaying between the DM of a user and a channel."""
+	__slots__ = ('user', 'channel', 'prefixes', 'timer', 'buffer', 'dropped', 'flusher')
+
+	def __init__(self, user: discord.User, channel: discord.TextChannel, prefixes: tuple) -> None:
+		self.user = user
+		self.channel = channel
+		self.prefixes = prefixes
+		self.timer = None
+		self.buffer = []
+		self.dropped = 0
+		self.flusher = None
 
 @cog_i18n(_)
 class Say(commands.Cog):
@@ -22,7 +71,73 @@ class Say(commands.Cog):
 
 	def __init__(self, bot: Red) -> None:
 		self.bot = bot
-		self.interaction = []
+		self.config = Config.get_conf(self, identifier=823288853745238067)
+		self.config.register_global(schedule={}, scheduleId=0)
+		self.sessions = {}
+		self.channels = {}
+		self.jobs = {}
+		self.heap = []
+		self.wakeup = asyncio.Event()
+		self.dispatcher = None
+
+	async def cog_load(self) -> None:
+		self.jobs = await self.config.schedule()
+		self.heap = [(job['next'], jid) for jid, job in self.jobs.items()]
+		heapq.heapify(self.heap)
+		self.dispatcher = asyncio.create_task(self.dispatch_schedule())
+
+	async def files_from_attach(self, message: discord.Message, channel: Optional[discord.abc.Messageable] = None, named: bool = False) -> list:
+		"""Download the attachments of a message concurrently, for re-uploading them to `channel`.
+
+		Attachments above the upload limit of the destination are skipped before downloading.
+		With `named`, large attachments are spooled to files that can be reopened by their name, and must be removed with `close_files`."""
+		limit = getattr(getattr(channel or message.channel, "guild", None), "filesize_limit", discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES)
+		if skipped := [x for x in message.attachments if x.size > limit]:
+			with suppress(discord.HTTPException):
+				await message.channel.send(warning(_("{files} exceeded the upload limit of {size} bytes and will not be sent.").format(
+					files=humanize_list([inline(x.filename) for x in skipped]), size=humanize_number(limit)
+				)), delete_after=15)
+
+		attachments = [x for x in message.attachments if x.size <= limit]
+		if not attachments:
+			return []
+		async with aiohttp.ClientSession() as session:
+			files = await asyncio.gather(*(self.download(session, x, named) for x in attachments), return_exceptions=True)
+		for result in [x for x in files if isinstance(x, Exception)]:
+			log.error("Failed to download an attachment.", exc_info=result)
+		return [x for x in files if isinstance(x, discord.File)]
+
+	async def download(self, session: aiohttp.ClientSession, attachment: discord.Attachment, named: bool = False) -> discord.File:
+		"""Stream an attachment into memory, or into a temporary file once it exceeds `SPOOL_THRESHOLD` bytes."""
+		if attachment.size <= SPOOL_THRESHOLD:
+			fp = io.BytesIO()
+		elif named:
+			fd, path = tempfile.mkstemp(prefix="say-")
+			os.close(fd)
+			fp = open(path, "w+b")
+		else:
+			fp = tempfile.TemporaryFile()
+		file = discord.File(fp, filename=attachment.filename, spoiler=attachment.is_spoiler())
+		try:
+			async with session.get(attachment.url) as response:
+				response.raise_for_status()
+				async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+					fp.write(chunk)
+		except BaseException:
+			self.close_files([file])
+			raise
+		fp.seek(0)
+		return file
+
+	@staticmethod
+	def close_files(files: list) -> None:
+		"""Close downloaded attachments, and remove the ones spooled to named files."""
+		for file in files:
+			file.close()
+			file.fp.close()
+			if isinstance(name := getattr(file.fp, "name", None), str):
+				with suppress(OSError):
+					os.remove(name)
 
 	async def say(
 		self,
@@ -72,14 +187,14 @@ class Say(commands.Cog):
 		Example usage :
 		- `!say #general hello there`
 		- `!say owo I have a file` (a file is attached to the command message)"""
-		files = await Tunnel.files_from_attach(ctx.message)
+		files = await self.files_from_attach(ctx.message, channel)
 		await self.say(ctx, channel, text, files)
 
 	@commands.command(name="sayad")
 	@checks.admin_or_permissions(administrator=True)
 	async def _sayautodelete(self, ctx: commands.Context, channel: Optional[discord.TextChannel], delete_delay: int, *, text: str = ""):
 		"""Same as say command, except it deletes the said message after a set number of seconds."""
-		files = await Tunnel.files_from_attach(ctx.message)
+		files = await self.files_from_attach(ctx.message, channel)
 		await self.say(ctx, channel, text, files, delete=delete_delay)
 
 	@commands.command(name="sayd", aliases=["sd"])
@@ -89,7 +204,7 @@ class Say(commands.Cog):
 
 		If the message wasn't removed, then I don't have enough permissions."""
 		# download the files BEFORE deleting the message
-		files = await Tunnel.files_from_attach(ctx.message)
+		files = await self.files_from_attach(ctx.message, channel)
 
 		try:
 			await ctx.message.delete()
@@ -108,7 +223,7 @@ class Say(commands.Cog):
 		message = ctx.message
 		channel = channel or ctx.channel
 		guild = channel.guild
-		files = await Tunnel.files_from_attach(message)
+		files = await self.files_from_attach(message, channel)
 
 		role_mentions = list(
 			filter(
@@ -148,6 +263,180 @@ class Say(commands.Cog):
 			ctx, channel, text, files, mentions=discord.AllowedMentions(everyone=True, roles=True)
 		)
 
+	@commands.command(name="saybc", aliases=["broadcast"])
+	@checks.admin_or_permissions(administrator=True)
+	@commands.guild_only()
+	async def _saybroadcast(
+		self,
+		ctx: commands.Context,
+		targets: commands.Greedy[Union[discord.TextChannel, discord.CategoryChannel, ChannelPattern, RemoteTextChannel]],
+		*,
+		text: str = "",
+	):
+		"""Same as say command, except the message is sent to many channels at once.
+
+		Targets can be channels, categories (all of their text channels) and `match:<pattern>` (all text channels whose name matches, e.g. `match:news-*`).
+		Channels of other servers can be given by ID, if you are an admin there.
+		Attachments are downloaded once and sent to every channel. A delivery summary is sent when done.
+
+		Example usage :
+		- `!saybc #general #off-topic hello there`
+		- `!saybc Events match:*-announcements The event starts now!`"""
+		channels = {}
+		for target in targets:
+			if isinstance(target, discord.CategoryChannel):
+				target = target.text_channels
+			for channel in target if isinstance(target, list) else [target]:
+				channels[channel.id] = channel
+		if not channels or not (text or ctx.message.attachments):
+			await ctx.send_help()
+			return
+
+		files = await self.files_from_attach(ctx.message, named=True)
+		semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+		def reopen(file: discord.File) -> discord.File:
+			# every upload reads its own handle, so concurrent uploads don't move each other's position
+			if isinstance(file.fp, io.BytesIO):
+				return discord.File(io.BytesIO(file.fp.getvalue()), filename=file.filename, spoiler=file.spoiler)
+			return discord.File(file.fp.name, filename=file.filename, spoiler=file.spoiler)
+
+		async def deliver(channel: discord.TextChannel) -> Optional[str]:
+			permissions = channel.permissions_for(channel.guild.me)
+			if not permissions.send_messages:
+				return _("not allowed to send messages")
+			if files and not permissions.attach_files:
+				return _("not allowed to upload files")
+			async with semaphore:
+				try:
+					await channel.send(text, files=[reopen(file) for file in files])
+				except discord.HTTPException as e:
+					return e.text or str(e.status)
+
+		try:
+			results = await asyncio.gather(*(deliver(channel) for channel in channels.values()))
+		finally:
+			self.close_files(files)
+		sent = [channel.mention for channel, result in zip(channels.values(), results) if result is None]
+		failed = ["{}: {}".format(channel.mention, result) for channel, result in zip(channels.values(), results) if result is not None]
+
+		summary = _("Sent to {count} of {total} channels.").format(count=len(sent), total=len(channels))
+		if sent:
+			summary += "\n" + humanize_list(sent)
+		if failed:
+			summary += "\n\n" + bold(_("Failed:")) + "\n" + "\n".join(failed)
+		for page in pagify(summary):
+			await ctx.send(page)
+
+	@commands.group(name="sayschedule", aliases=["ss"])
+	@checks.admin_or_permissions(administrator=True)
+	@commands.guild_only()
+	async def _sayschedule(self, ctx: commands.Context):
+		"""Schedule messages to be said later, once or repeatedly.
+
+		Messages that were due while the bot was offline are sent once when it is back."""
+
+	@_sayschedule.command(name="add")
+	async def _sayschedule_add(self, ctx: commands.Context, delay: commands.TimedeltaConverter, channel: Optional[discord.TextChannel], *, text: str):
+		"""Say something once, after a delay.
+
+		Example usage :
+		- `!sayschedule add 2h #general The event starts in one hour!`"""
+		await self.schedule(ctx, channel or ctx.channel, text, delay, None)
+
+	@_sayschedule.command(name="every")
+	async def _sayschedule_every(self, ctx: commands.Context, interval: commands.TimedeltaConverter, channel: Optional[discord.TextChannel], *, text: str):
+		"""Say something repeatedly, every interval.
+
+		Example usage :
+		- `!sayschedule every 1d #general Good morning!`"""
+		if interval.total_seconds() < SCHEDULE_MIN_INTERVAL:
+			return await ctx.send(error(_("The interval can't be shorter than {seconds} seconds.").format(seconds=SCHEDULE_MIN_INTERVAL)))
+		await self.schedule(ctx, channel or ctx.channel, text, interval, interval)
+
+	@_sayschedule.command(name="list")
+	async def _sayschedule_list(self, ctx: commands.Context):
+		"""List the scheduled messages of this server."""
+		lines = []
+		for jid, job in sorted(self.jobs.items(), key=lambda x: x[1]['next']):
+			if (channel := ctx.guild.get_channel(job['channel'])) is None:
+				continue
+			every = _(" every {time}").format(time=humanize_timedelta(seconds=job['interval'])) if job['interval'] else ""
+			lines.append("{} {} <t:{}:R>{}: {}".format(inline(jid), channel.mention, int(job['next']), every, job['text']))
+		if not lines:
+			return await ctx.send(warning(_("There are no scheduled messages.")))
+		for page in pagify("\n".join(lines)):
+			await ctx.send(page)
+
+	@_sayschedule.command(name="remove")
+	async def _sayschedule_remove(self, ctx: commands.Context, jid: str):
+		"""Remove a scheduled message."""
+		if not (job := self.jobs.get(jid)) or not ctx.guild.get_channel(job['channel']):
+			return await ctx.send(error(_("Scheduled message not found.")))
+		del self.jobs[jid]
+		await self.config.schedule.clear_raw(jid)
+		await ctx.send(success(_("Scheduled message {id} has been removed.").format(id=inline(jid))))
+
+	async def schedule(self, ctx: commands.Context, channel: discord.TextChannel, text: str, delay: timedelta, interval: Optional[timedelta]):
+		if not channel.permissions_for(ctx.guild.me).send_messages:
+			return await ctx.send(error(_("I am not allowed to send messages in {channel}").format(channel=channel.mention)))
+
+		jid = str(await self.config.scheduleId() + 1)
+		await self.config.scheduleId.set(int(jid))
+		job = {
+			'channel': channel.id,
+			'text': text,
+			'next': time.time() + delay.total_seconds(),
+			'interval': int(interval.total_seconds()) if interval else 0,
+		}
+		await self.config.schedule.set_raw(jid, value=job)
+		self.push_job(jid, job)
+		await ctx.send(success(_("Scheduled message {id} will be sent in {channel} <t:{time}:R>.").format(id=inline(jid), channel=channel.mention, time=int(job['next']))))
+
+	def push_job(self, jid: str, job: dict):
+		self.jobs[jid] = job
+		if not self.heap or job['next'] < self.heap[0][0]:
+			self.wakeup.set()
+		heapq.heappush(self.heap, (job['next'], jid))
+
+	async def dispatch_schedule(self):
+		"""Sleep until the earliest scheduled message is due, and send it.
+
+		A single task drives all scheduled messages, and is woken up early when a message is scheduled before the earliest one.
+		Heap entries of removed or rescheduled messages are skipped when they come up."""
+		await self.bot.wait_until_red_ready()
+		while True:
+			self.wakeup.clear()
+			if not self.heap or (delay := self.heap[0][0] - time.time()) > 0:
+				with suppress(asyncio.TimeoutError):
+					await asyncio.wait_for(self.wakeup.wait(), timeout=delay if self.heap else None)
+				continue
+
+			due, jid = heapq.heappop(self.heap)
+			if (job := self.jobs.get(jid)) is None or job['next'] != due:
+				continue
+			try:
+				await self.run_job(jid, job)
+			except Exception:
+				log.error("Failed to send scheduled message %s.", jid, exc_info=True)
+
+	async def run_job(self, jid: str, job: dict):
+		channel = self.bot.get_channel(job['channel'])
+		if channel and channel.permissions_for(channel.guild.me).send_messages:
+			with suppress(discord.HTTPException):
+				await channel.send(job['text'])
+
+		if not channel or not job['interval']:
+			del self.jobs[jid]
+			return await self.config.schedule.clear_raw(jid)
+
+		# skip occurrences missed while offline, they have been sent once now
+		now = time.time()
+		while job['next'] <= now:
+			job['next'] += job['interval']
+		await self.config.schedule.set_raw(jid, value=job)
+		self.push_job(jid, job)
+
 	@commands.command(name="interact")
 	@checks.admin_or_permissions(administrator=True)
 	async def _interact(self, ctx: commands.Context, channel: discord.TextChannel = None):
@@ -159,7 +448,7 @@ class Say(commands.Cog):
 			else:
 				channel = ctx.channel
 
-		if ctx.author in self.interaction:
+		if ctx.author.id in self.sessions:
 			await ctx.send(warning(_("A session is already running.")))
 			return
 
@@ -173,41 +462,94 @@ class Say(commands.Cog):
 			).format(channel.mention)
 		)
 		await message.add_reaction("❌")
-		self.interaction.append(ctx.author)
 
-		while True:
-			if ctx.author not in self.interaction:
-				return
+		session = Session(ctx.author, channel, tuple(await self.bot.get_valid_prefixes()))
+		self.sessions[ctx.author.id] = session
+		self.channels.setdefault(channel.id, set()).add(session)
+		self.touch(session)
 
-			try:
-				message = await self.bot.wait_for("message", timeout=300)
-			except asyncio.TimeoutError:
-				await ctx.author.send(_("Request timed out. Session closed"))
-				self.interaction.remove(ctx.author)
-				return
+	@commands.Cog.listener()
+	async def on_message(self, message: discord.Message):
+		if isinstance(message.channel, discord.DMChannel):
+			if (session := self.sessions.get(message.author.id)) and not message.content.startswith(session.prefixes):
+				self.touch(session)
+				files = await self.files_from_attach(message, session.channel)
+				await session.channel.send(message.content, files=files)
+		elif message.guild and message.author != message.guild.me:
+			for session in list(self.channels.get(message.channel.id, ())):
+				if message.author != session.user:
+					self.touch(session)
+					self.relay(session, message)
+
+	def relay(self, session: Session, message: discord.Message):
+		"""Buffer a channel message, so messages arriving within `RELAY_WINDOW` seconds are sent in one DM."""
+		if len(session.buffer) < RELAY_BUFFER:
+			session.buffer.append(message)
+		else:
+			session.dropped += 1
+		if not session.flusher:
+			session.flusher = asyncio.create_task(self.flush_relay(session))
 
-			if message.author == ctx.author and isinstance(message.channel, discord.DMChannel):
-				files = await Tunnel.files_from_attach(message)
-				if message.content.startswith(tuple(await self.bot.get_valid_prefixes())):
-					return
-				await channel.send(message.content, files=files)
-			elif (message.channel != channel or message.author == channel.guild.me or message.author == ctx.author):
-				pass
+	async def flush_relay(self, session: Session):
+		try:
+			await asyncio.sleep(RELAY_WINDOW)
+			while session.buffer or session.dropped:
+				messages, session.buffer = session.buffer, []
+				dropped, session.dropped = session.dropped, 0
+				if len(messages) <= 10:
+					await self.send_embeds(session, messages)
+				else:
+					await self.send_digest(session, messages)
+				if dropped:
+					await session.user.send(warning(_("{count} more messages in {channel} were not relayed, as they arrived too fast.").format(count=dropped, channel=session.channel.mention)))
+		except discord.HTTPException:
+			log.error("Failed to relay messages.", exc_info=True)
+		finally:
+			session.flusher = None
+
+	async def send_embeds(self, session: Session, messages: list):
+		"""Send messages as embeds, as many as fit in a single DM."""
+		embeds = []
+		for message in messages:
+			embed = self.relay_embed(message)
+			if embeds and sum(len(x) for x in embeds) + len(embed) > 6000:
+				await session.user.send(embeds=embeds)
+				embeds = []
+			embeds.append(embed)
+		if embeds:
+			await session.user.send(embeds=embeds)
+
+	async def send_digest(self, session: Session, messages: list):
+		"""Send messages as a paged text digest, for when too many arrived to send as embeds."""
+		lines = []
+		for message in messages:
+			line = "{} {}: {}".format(message.created_at.strftime("%H:%M"), bold(str(message.author)), message.content)
+			lines.extend([line] + [attachment.url for attachment in message.attachments])
+		for page in pagify("\n".join(lines)):
+			await session.user.send(page)
+
+	def relay_embed(self, message: discord.Message) -> discord.Embed:
+		embed = discord.Embed()
+		embed.set_author(
+			name="{} | {}".format(str(message.author), message.author.id),
+			icon_url=message.author.display_avatar.url,
+		)
+		embed.set_footer(text=message.created_at.strftime("%d %b %Y %H:%M"))
+		embed.description = message.content
+		embed.colour = message.author.color
 
-			else:
-				embed = discord.Embed()
-				embed.set_author(
-					name="{} | {}".format(str(message.author), message.author.id),
-					icon_url=message.author.avatar.url,
-				)
-				embed.set_footer(text=message.created_at.strftime("%d %b %Y %H:%M"))
-				embed.description = message.content
-				embed.colour = message.author.color
+		if message.attachments != []:
+			embed.set_image(url=message.attachments[0].url)
 
-				if message.attachments != []:
-					embed.set_image(url=message.attachments[0].url)
+		return embed
 
-				await ctx.author.send(embed=embed)
+	def touch(self, session: Session):
+		"""Restart the inactivity timer of a session."""
+		if session.timer:
+			session.timer.cancel()
+		session.timer = asyncio.get_running_loop().call_later(
+			SESSION_TIMEOUT, lambda: asyncio.create_task(self.stop_interaction(session.user, _("Request timed out. Session closed")))
+		)
 
 	# ----- Slash commands -----
 	@app_commands.command(name="say", description="Make the bot send a message")
@@ -242,6 +584,9 @@ class Say(commands.Cog):
 		if file and not channel.permissions_for(guild.me).attach_files:
 			await interaction.response.send_message(_("I don't have the permission to upload files there."), ephemeral=True)
 			return
+		if file and file.size > guild.filesize_limit:
+			await interaction.response.send_message(_("This file exceeds the upload limit of {size} bytes.").format(size=humanize_number(guild.filesize_limit)), ephemeral=True)
+			return
 
 		if mentions:
 			mentions = discord.AllowedMentions(
@@ -252,7 +597,9 @@ class Say(commands.Cog):
 		else:
 			mentions = None
 
-		file = await file.to_file(use_cached=True) if file else None
+		if file:
+			async with aiohttp.ClientSession() as session:
+				file = await self.download(session, file)
 		try:
 			await channel.send(message, file=file, delete_after=delete_delay)
 		except discord.HTTPException:
@@ -270,13 +617,23 @@ class Say(commands.Cog):
 
 	@commands.Cog.listener()
 	async def on_reaction_add(self, reaction, user):
-		if user in self.interaction and isinstance(reaction.message.channel, discord.DMChannel):
+		if user.id in self.sessions and isinstance(reaction.message.channel, discord.DMChannel):
 			await self.stop_interaction(user)
 
-	async def stop_interaction(self, user):
-		self.interaction.remove(user)
-		await user.send(_("Session closed"))
+	async def stop_interaction(self, user, message: str = None):
+		if not (session := self.sessions.pop(user.id, None)):
+			return
+		session.timer.cancel()
+		if session.flusher:
+			session.flusher.cancel()
+		if (sessions := self.channels.get(session.channel.id)) is not None:
+			sessions.discard(session)
+			if not sessions:
+				del self.channels[session.channel.id]
+		await user.send(message or _("Session closed"))
 
 	async def cog_unload(self):
-		for user in self.interaction:
-			await self.stop_interaction(user)
+		if self.dispatcher:
+			self.dispatcher.cancel()
+		for session in list(self.sessions.values()):
+			await self.stop_interaction(session.user)
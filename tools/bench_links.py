@@ -0,0 +1,88 @@
+"""Micro-benchmark for `find_links`, against the per-link `urlparse` extraction it replaced.
+
+Run it from the repo root with `python tools/bench_links.py`. Importing the cog package needs Red-DiscordBot installed. Use `--corpus FILE` to benchmark real chat messages, with one message per line."""
+import argparse
+import random
+import re
+import sys
+import timeit
+
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT)]
+
+from ytdedup.links import find_links
+
+SAMPLES = [
+	"lol that's amazing",
+	"did anyone watch the stream yesterday? it was wild",
+	"check this out https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+	"https://youtu.be/dQw4w9WgXcQ?t=42 the drop at 0:42 though",
+	"new one from them https://www.youtube.com/watch?v=9bZkp7q19f0&list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI&index=3",
+	"shorts are getting out of hand https://youtube.com/shorts/aqz-KE-bpKQ",
+	"live now!! https://www.youtube.com/live/jfKfPfyJRdk?si=abc",
+	"https://music.youtube.com/watch?v=kJQP7kiw5Fk&feature=share",
+	"not youtube: https://github.com/Cog-Creators/Red-DiscordBot/issues/1234 and https://example.com/a/b?c=d",
+	"two at once https://youtu.be/3JZ_D3ELwOQ and https://www.youtube.com/watch?v=L_jWHffIx5E",
+	"broken link https://www.youtube.com/watch?feature=share",
+	"<https://www.youtube.com/watch?v=OPf0YbXqDm0> suppressed embed",
+	"```py\nprint('no links here, just code')\n```",
+	"https://cdn.discordapp.com/attachments/1/2/image.png",
+	"a longer message that goes on for a while about nothing in particular, " * 4,
+]
+
+YID_REGEX = re.compile(r"[-_A-Za-z0-9]{11}")
+
+def baseline(message) -> list:
+	"""The extraction YouTubeDeDup used before `find_links`."""
+	if message.embeds:
+		urls = [embed.url for embed in message.embeds if embed.url]
+	else:
+		urls = re.findall(r'(https?://\S+/\S+[a-zA-Z0-9])', message.content)
+	yids = []
+	for url in urls:
+		yid = None
+		query = urlparse(url)
+		if query.hostname == 'youtu.be':
+			yid = query.path[1:]
+		if query.hostname in {'www.youtube.com', 'youtube.com', 'music.youtube.com'}:
+			if query.path == '/watch':
+				yid = parse_qs(query.query).get('v', [None])[0]
+			elif query.path.startswith(('/watch/', '/shorts/', '/live/', '/embed/', '/v/')):
+				yid = query.path.split('/')[2]
+		if yid and YID_REGEX.fullmatch(yid):
+			yids.append(yid)
+	return yids
+
+def make_corpus(lines: list, size: int, embeds: float) -> list:
+	rng = random.Random(42)
+	corpus = []
+	for _ in range(size):
+		content = rng.choice(lines)
+		urls = re.findall(r"https?://[^\s<>]+", content) if rng.random() < embeds else []
+		corpus.append(SimpleNamespace(content=content, embeds=[SimpleNamespace(url=url) for url in urls]))
+	return corpus
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--corpus", help="file with one chat message per line")
+	parser.add_argument("--size", type=int, default=10000, help="number of messages per run")
+	parser.add_argument("--embeds", type=float, default=0.3, help="share of messages whose links also have an embed")
+	parser.add_argument("--repeat", type=int, default=5)
+	args = parser.parse_args()
+
+	lines = SAMPLES
+	if args.corpus:
+		with open(args.corpus, encoding="utf-8") as fp:
+			lines = [line.rstrip("\n").replace("\\n", "\n") for line in fp if line.strip()]
+	corpus = make_corpus(lines, args.size, args.embeds)
+
+	for name, func in (("baseline", baseline), ("find_links", find_links)):
+		best = min(timeit.repeat(lambda: [func(message) for message in corpus], number=1, repeat=args.repeat))
+		print(f"{name:>10}: {best / len(corpus) * 1e6:6.2f} µs/message, {len(corpus) / best:10,.0f} messages/s")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,286 @@
+"""Synthetic message flood for the `on_message` listeners of YouTubeDeDup, KirA and the Say interact sessions.
+
+The cogs are loaded with an in-memory Config stub and fed message-like objects at a fixed rate or as fast as they are handled.
+For every cog it reports messages per second, p50/p99 handling latency and Config calls per message.
+Memory growth is measured in a second pass with tracemalloc, so tracing doesn't slow down the timed pass.
+
+Run it from the repo root with `python tools/flood.py`. It needs Red-DiscordBot installed.
+Use `--save FILE` to keep the results as a baseline and `--baseline FILE` to compare a later run against it."""
+import argparse
+import asyncio
+import importlib
+import inspect
+import json
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "tools")]
+
+import discord
+
+from stubs import StubBot, stub_config
+
+COGS = ("ytdedup", "kira", "say")
+# name, unit, format, and whether higher (1) or lower (-1) is better
+METRICS = (
+	("rate", "msg/s", ",.0f", 1),
+	("capacity", "msg/s", ",.0f", 1),
+	("p50", "ms", ".3f", -1),
+	("p99", "ms", ".3f", -1),
+	("config", "calls/msg", ".2f", -1),
+	("memory", "KiB/1k msg", ",.1f", -1),
+)
+TEXTS = [
+	"lol",
+	"did anyone watch the stream yesterday? it was wild",
+	"a longer message that goes on for a while about nothing in particular, " * 3,
+	"```py\nprint('no links here, just code')\n```",
+	"not youtube: https://github.com/Cog-Creators/Red-DiscordBot and https://example.com/a/b?c=d",
+]
+LINKS = ["https://www.youtube.com/watch?v={}", "https://youtu.be/{}?t=42", "https://youtube.com/shorts/{}", "https://music.youtube.com/watch?v={}&feature=share"]
+PERMISSIONS = SimpleNamespace(read_messages=True, send_messages=True, manage_messages=True, attach_files=True, embed_links=True, mention_everyone=False)
+
+class StubUser:
+	def __init__(self, user_id: int, guild=None, bot: bool = False) -> None:
+		self.id = user_id
+		self.guild = guild
+		self.bot = bot
+		self.roles = []
+		self.mention = f"<@{user_id}>"
+		self.display_avatar = SimpleNamespace(url=f"https://cdn.discordapp.com/embed/avatars/{user_id % 5}.png")
+		self.color = discord.Colour.default()
+		self.sent = 0
+
+	def __str__(self) -> str:
+		return f"user{self.id}"
+
+	async def send(self, *args, **kwargs) -> None:
+		self.sent += 1
+
+class StubMessage:
+	def __init__(self, message_id: int, channel, author, content: str = "", embeds: list = ()) -> None:
+		self.id = message_id
+		self.channel = channel
+		self.guild = channel.guild
+		self.author = author
+		self.content = content
+		self.embeds = list(embeds)
+		self.attachments = []
+		self.created_at = discord.utils.snowflake_time(message_id)
+
+	async def reply(self, content: str, **kwargs) -> "StubMessage":
+		return await self.channel.send(content, **kwargs)
+
+	async def delete(self) -> None:
+		self.channel.deleted += 1
+
+class StubChannel:
+	def __init__(self, channel_id: int, guild) -> None:
+		self.id = channel_id
+		self.guild = guild
+		self.name = f"channel-{channel_id}"
+		self.mention = f"<#{channel_id}>"
+		self.sent = 0
+		self.deleted = 0
+
+	def permissions_for(self, member) -> SimpleNamespace:
+		return PERMISSIONS
+
+	async def send(self, content: str = None, **kwargs) -> StubMessage:
+		self.sent += 1
+		return StubMessage(self.guild.snowflake(), self, self.guild.me, content or "")
+
+	async def delete_messages(self, messages: list) -> None:
+		self.deleted += len(messages)
+
+	def get_partial_message(self, message_id: int) -> StubMessage:
+		return StubMessage(message_id, self, None)
+
+class StubGuild:
+	def __init__(self, guild_id: int, channels: int) -> None:
+		self.id = guild_id
+		self.me = StubUser(1, self, bot=True)
+		self.owner = StubUser(2, self)
+		self.text_channels = [StubChannel(guild_id + i, self) for i in range(1, channels + 1)]
+		self.next_id = discord.utils.time_snowflake(discord.utils.utcnow())
+
+	def snowflake(self) -> int:
+		self.next_id += 1 << 12
+		return self.next_id
+
+class Flood:
+	"""Generates a reproducible stream of messages with a given share of YouTube links and reposts."""
+
+	def __init__(self, guild: StubGuild, users: int, links: float, reposts: float, bots: float, seed: int = 42) -> None:
+		self.guild = guild
+		self.rng = random.Random(seed)
+		self.users = [StubUser(1000 + i, guild, bot=self.rng.random() < bots) for i in range(users)]
+		self.links = links
+		self.reposts = reposts
+		self.recent = []
+
+	def video(self) -> str:
+		if self.recent and self.rng.random() < self.reposts:
+			return self.rng.choice(self.recent)
+		yid = "".join(self.rng.choices(string.ascii_letters + string.digits + "-_", k=11))
+		self.recent = (self.recent + [yid])[-1000:]
+		return yid
+
+	def message(self) -> StubMessage:
+		channel = self.rng.choice(self.guild.text_channels)
+		content, embeds = self.rng.choice(TEXTS), []
+		if self.rng.random() < self.links:
+			url = self.rng.choice(LINKS).format(self.video())
+			content = f"{content} {url}" if self.rng.random() < 0.5 else url
+			if self.rng.random() < 0.3:
+				embeds.append(SimpleNamespace(url=url))
+		return StubMessage(self.guild.snowflake(), channel, self.rng.choice(self.users), content, embeds)
+
+async def load(name: str, bot: StubBot) -> tuple:
+	"""Load a cog with stub Config, and watch every channel of the guild."""
+	configs = []
+	with stub_config(configs):
+		module = importlib.import_module(name)
+		await module.setup(bot)
+	cog = list(bot.cogs.values())[-1]
+	config = configs[0]
+	guild = next(iter(bot.channels.values())).guild
+	if name == "ytdedup":
+		for channel in guild.text_channels:
+			await config.channel(channel).messages.set({})
+		cog.watched = None
+	elif name == "kira":
+		for channel in guild.text_channels:
+			await config.channel(channel).trusted.set([])
+		cog.watched = None
+	elif name == "say":
+		from say.say import Session
+		for i, channel in enumerate(guild.text_channels[:3]):
+			session = Session(StubUser(10 + i), channel, ("!",))
+			cog.sessions[session.user.id] = session
+			cog.channels.setdefault(channel.id, set()).add(session)
+			cog.touch(session)
+	return cog, configs
+
+async def drive(listeners: dict, configs: dict, flood: Flood, count: int, rate: float) -> dict:
+	"""Send `count` messages to every listener and time each of them."""
+	latencies = {name: [] for name in listeners}
+	calls = {name: sum(sum(config.calls.values()) for config in configs[name]) for name in listeners}
+	start = time.perf_counter()
+	for i in range(count):
+		if rate:
+			await asyncio.sleep(max(0, start + i / rate - time.perf_counter()))
+		else:
+			# let the deletions, relays and question timers the listeners scheduled run
+			await asyncio.sleep(0)
+		message = flood.message()
+		for name, listener in listeners.items():
+			began = time.perf_counter()
+			await listener(message)
+			latencies[name].append(time.perf_counter() - began)
+	elapsed = time.perf_counter() - start
+
+	results = {}
+	for name, values in latencies.items():
+		values.sort()
+		results[name] = {
+			'rate': count / elapsed,
+			'capacity': count / sum(values) if sum(values) else 0,
+			'p50': statistics.median(values) * 1000,
+			'p99': values[min(len(values) - 1, int(len(values) * 0.99))] * 1000,
+			'config': (sum(sum(config.calls.values()) for config in configs[name]) - calls[name]) / count,
+		}
+	return results
+
+async def measure_memory(listeners: dict, flood: Flood, count: int) -> dict:
+	"""Return how much memory each listener retains per 1000 messages."""
+	growth = {}
+	tracemalloc.start()
+	try:
+		for name, listener in listeners.items():
+			before = tracemalloc.get_traced_memory()[0]
+			for _ in range(count):
+				await asyncio.sleep(0)
+				await listener(flood.message())
+			growth[name] = (tracemalloc.get_traced_memory()[0] - before) / 1024 / count * 1000
+	finally:
+		tracemalloc.stop()
+	return growth
+
+async def run(args: argparse.Namespace) -> dict:
+	guild = StubGuild(10 ** 17, args.channels)
+	bot = StubBot(user=guild.me, channels={channel.id: channel for channel in guild.text_channels})
+	cogs, configs = {}, {}
+	for name in args.cogs:
+		cogs[name], configs[name] = await load(name, bot)
+	if args.storage == "compact" and "ytdedup" in cogs:
+		from ytdedup.store import CompactStore
+		cogs["ytdedup"].compact = CompactStore(Path(tempfile.mkdtemp(prefix="flood-")))
+	listeners = {name: cog.on_message for name, cog in cogs.items()}
+
+	flood = Flood(guild, args.users, args.links, args.reposts, args.bots)
+	# warm up caches and lazy imports, so the timed pass measures the steady state
+	await drive(listeners, configs, flood, min(args.messages, 500), 0)
+	results = await drive(listeners, configs, flood, args.messages, args.rate)
+	if args.memory:
+		for name, growth in (await measure_memory(listeners, flood, args.memory)).items():
+			results[name]['memory'] = growth
+
+	for cog in cogs.values():
+		if inspect.isawaitable(unloaded := cog.cog_unload()):
+			await unloaded
+	return results
+
+def report(results: dict, baseline: dict) -> None:
+	print(f"{'cog':<10}" + "".join(f"{name:>20}" for name, _unit, _format, _better in METRICS))
+	print(f"{'':<10}" + "".join(f"{unit:>20}" for _name, unit, _format, _better in METRICS))
+	for cog, values in results.items():
+		cells = []
+		for name, _unit, spec, better in METRICS:
+			if (value := values.get(name)) is None:
+				cells.append(f"{'-':>20}")
+				continue
+			cell = format(value, spec)
+			if (base := baseline.get(cog, {}).get(name)):
+				change = (value - base) / base * 100
+				cell += " ({:+.0f}%{})".format(change, "!" if change * better < -10 else "")
+			cells.append(f"{cell:>20}")
+		print(f"{cog:<10}" + "".join(cells))
+	if baseline:
+		print("\nchanges are against the baseline, ! marks a regression of more than 10%")
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("cogs", nargs="*", default=list(COGS), help="cogs to flood: {}, all by default".format(", ".join(COGS)))
+	parser.add_argument("--messages", type=int, default=20000, help="messages in the timed pass")
+	parser.add_argument("--rate", type=float, default=0, help="messages per second, 0 sends them as fast as they are handled")
+	parser.add_argument("--channels", type=int, default=20, help="watched channels")
+	parser.add_argument("--users", type=int, default=50000, help="members sending the messages")
+	parser.add_argument("--links", type=float, default=0.1, help="share of messages with a YouTube link")
+	parser.add_argument("--reposts", type=float, default=0.2, help="share of links to a video that was recently posted")
+	parser.add_argument("--bots", type=float, default=0.01, help="share of members that are bots")
+	parser.add_argument("--storage", choices=["config", "compact"], default="config", help="history storage of YouTubeDeDup")
+	parser.add_argument("--memory", type=int, default=5000, help="messages in the memory pass, 0 skips it")
+	parser.add_argument("--baseline", type=Path, help="results of an earlier run to compare against")
+	parser.add_argument("--save", type=Path, help="write the results to a file, for use as baseline")
+	args = parser.parse_args()
+	if unknown := set(args.cogs) - set(COGS):
+		parser.error("unknown cogs: {}".format(", ".join(sorted(unknown))))
+
+	results = asyncio.run(run(args))
+	baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+	report(results, baseline)
+	if args.save:
+		args.save.write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+	main()
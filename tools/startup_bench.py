@@ -0,0 +1,123 @@
+"""Startup benchmark for every cog in this repo, against a time budget.
+
+For each cog it measures the import of its package, `setup()` (the cog's `__init__` and `cog_load`), and the time from there to the end of the first tick of each loop that is running after `setup()`.
+Every cog is measured in a fresh interpreter, so nothing is imported yet. Config is replaced with an in-memory stub and the bot with a stub that is ready at once.
+
+Run it from the repo root with `python tools/startup_bench.py`. It needs Red-DiscordBot and the requirements of the cogs installed.
+Exits with status 1 when the median of any measurement is over its budget."""
+import argparse
+import asyncio
+import functools
+import importlib
+import inspect
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+TICK_TIMEOUT = 60
+
+def cogs() -> list:
+	return sorted(path.parent.name for path in ROOT.glob("*/info.json") if (path.parent / "__init__.py").exists())
+
+async def measure(name: str) -> dict:
+	"""Load one cog and time it. Runs in the child process."""
+	from discord.ext import commands, tasks
+	from stubs import StubBot, stub_config
+
+	result = {}
+	with stub_config([]):
+		start = time.perf_counter()
+		module = importlib.import_module(name)
+		result['import'] = (time.perf_counter() - start) * 1000
+
+		ticks = {}
+		for cls in [x for x in vars(module).values() if inspect.isclass(x) and issubclass(x, commands.Cog)]:
+			for attr, loop in inspect.getmembers(cls, lambda x: isinstance(x, tasks.Loop)):
+				ticks[(cls, attr)] = asyncio.get_running_loop().create_future()
+				loop.coro = first_tick(loop.coro, ticks[(cls, attr)])
+
+		bot = StubBot()
+		start = time.perf_counter()
+		await module.setup(bot)
+		ready = time.perf_counter()
+		result['init'] = (ready - start) * 1000
+
+		# loops that only start on demand, like KirA.expire_questions, have no first tick to wait for
+		running = {
+			f"{type(cog).__name__}.{attr}": future
+			for cog in bot.cogs.values() for (cls, attr), future in ticks.items()
+			if isinstance(cog, cls) and getattr(cog, attr).is_running()
+		}
+		if running:
+			await asyncio.wait(running.values(), timeout=TICK_TIMEOUT)
+			if pending := [name for name, future in running.items() if not future.done()]:
+				result['tick'] = None
+				result['error'] = "no first tick within {} seconds: {}".format(TICK_TIMEOUT, ", ".join(pending))
+			else:
+				result['tick'] = (max(future.result() for future in running.values()) - ready) * 1000
+
+		for cog in bot.cogs.values():
+			if inspect.isawaitable(unloaded := cog.cog_unload()):
+				await unloaded
+	return result
+
+def first_tick(coro, future: asyncio.Future):
+	@functools.wraps(coro)
+	async def wrapped(*args, **kwargs):
+		try:
+			return await coro(*args, **kwargs)
+		finally:
+			if not future.done():
+				future.set_result(time.perf_counter())
+	return wrapped
+
+def run_child(name: str) -> dict:
+	proc = subprocess.run([sys.executable, __file__, "--child", name], cwd=ROOT, capture_output=True, text=True)
+	if proc.returncode:
+		return {'error': (proc.stderr.strip().splitlines() or [f"exit status {proc.returncode}"])[-1]}
+	return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("cogs", nargs="*", help="cogs to measure, all cogs by default")
+	parser.add_argument("--runs", type=int, default=3, help="runs per cog, the median is reported")
+	parser.add_argument("--import-budget", type=float, default=500, help="milliseconds")
+	parser.add_argument("--init-budget", type=float, default=50, help="milliseconds")
+	parser.add_argument("--tick-budget", type=float, default=1000, help="milliseconds")
+	parser.add_argument("--child", help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.child:
+		sys.path[:0] = [str(ROOT), str(ROOT / "tools")]
+		print(json.dumps(asyncio.run(measure(args.child))))
+		return
+
+	budgets = {'import': args.import_budget, 'init': args.init_budget, 'tick': args.tick_budget}
+	over = False
+	print(f"{'cog':<12} {'import':>10} {'init':>10} {'first tick':>10}")
+	for name in args.cogs or cogs():
+		runs = [run_child(name) for _ in range(args.runs)]
+		if errors := [run['error'] for run in runs if 'error' in run]:
+			print(f"{name:<12} failed: {errors[0]}")
+			over = True
+			continue
+		cells = []
+		for key, budget in budgets.items():
+			values = [run[key] for run in runs if run.get(key) is not None]
+			if not values:
+				cells.append(f"{'-':>10} ")
+				continue
+			median = statistics.median(values)
+			over |= median > budget
+			cells.append(f"{median:9.1f}{'!' if median > budget else ' '} ")
+		print(f"{name:<12} {''.join(cells).rstrip()}")
+	print("\nmedian milliseconds, ! marks a value over its budget ({})".format(", ".join(f"{key} {budget:g}" for key, budget in budgets.items())))
+	sys.exit(1 if over else 0)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,221 @@
+"""In-memory stand-ins for Red's Config and bot, for benchmarking cogs without a running bot.
+
+`StubConfig` copies values in and out like Red's JSON driver does, and counts every read and write."""
+import copy
+import json
+
+from collections import Counter
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+class ValueContext:
+	"""What calling a Config value returns: awaitable for a copy, or usable with `async with` to change it in place."""
+
+	def __init__(self, group: "StubGroup", default) -> None:
+		self.group = group
+		self.default = default
+		self.value = None
+
+	def __await__(self):
+		return self.group.get(self.default).__await__()
+
+	async def __aenter__(self):
+		self.value = await self.group.get(self.default)
+		return self.value
+
+	async def __aexit__(self, *exc) -> None:
+		await self.group.set(self.value)
+
+class StubGroup:
+	"""A group or value of a `StubConfig`, addressed by its path in the data."""
+
+	def __init__(self, config: "StubConfig", category: str, keys: tuple, attrs: tuple = ()) -> None:
+		self.config = config
+		self.category = category
+		self.keys = keys
+		self.attrs = attrs
+
+	def __getattr__(self, name: str) -> "StubGroup":
+		if name.startswith("__"):
+			raise AttributeError(name)
+		return StubGroup(self.config, self.category, self.keys, self.attrs + (name,))
+
+	def __call__(self, default=None) -> ValueContext:
+		return ValueContext(self, default)
+
+	def defaults(self, attrs: tuple):
+		value = self.config.defaults.get(self.category, {})
+		for attr in attrs:
+			if not isinstance(value, dict) or attr not in value:
+				return None
+			value = value[attr]
+		return value
+
+	async def get(self, default=None, attrs: tuple = None):
+		self.config.calls["get"] += 1
+		attrs = self.attrs if attrs is None else attrs
+		node = self.config.data.get(self.category, {})
+		for key in (*self.keys, *attrs):
+			if not isinstance(node, dict) or key not in node:
+				node = self.defaults(attrs)
+				if node is None:
+					node = default
+				break
+			node = node[key]
+		else:
+			if isinstance(node, dict) and isinstance(defaults := self.defaults(attrs), dict):
+				node = {**defaults, **node}
+		return copy.deepcopy(node)
+
+	async def set(self, value, attrs: tuple = None) -> None:
+		self.config.calls["set"] += 1
+		attrs = self.attrs if attrs is None else attrs
+		*parents, last = (self.category, *self.keys, *attrs)
+		node = self.config.data
+		for key in parents:
+			node = node.setdefault(key, {})
+		node[last] = json.loads(json.dumps(value))
+
+	async def clear(self) -> None:
+		self.config.calls["clear"] += 1
+		*parents, last = (self.category, *self.keys, *self.attrs)
+		node = self.config.data
+		for key in parents:
+			if (node := node.get(key)) is None:
+				return
+		node.pop(last, None)
+
+	async def all(self) -> dict:
+		return await self.get({})
+
+	async def get_raw(self, *attrs, default=None):
+		return await self.get(default, self.attrs + tuple(str(x) for x in attrs))
+
+	async def set_raw(self, *attrs, value) -> None:
+		await self.set(value, self.attrs + tuple(str(x) for x in attrs))
+
+	async def clear_raw(self, *attrs) -> None:
+		await StubGroup(self.config, self.category, self.keys, self.attrs + tuple(str(x) for x in attrs)).clear()
+
+class StubConfig:
+	"""Drop-in for the parts of `redbot.core.Config` the cogs in this repo use."""
+
+	def __init__(self) -> None:
+		self.defaults = {}
+		self.data = {}
+		self.calls = Counter()
+
+	def register(self, category: str, **defaults) -> None:
+		self.defaults.setdefault(category, {}).update(defaults)
+
+	def register_global(self, **defaults) -> None:
+		self.register("GLOBAL", **defaults)
+
+	def register_guild(self, **defaults) -> None:
+		self.register("GUILD", **defaults)
+
+	def register_channel(self, **defaults) -> None:
+		self.register("CHANNEL", **defaults)
+
+	def register_role(self, **defaults) -> None:
+		self.register("ROLE", **defaults)
+
+	def register_user(self, **defaults) -> None:
+		self.register("USER", **defaults)
+
+	def register_member(self, **defaults) -> None:
+		self.register("MEMBER", **defaults)
+
+	def init_custom(self, name: str, keys: int) -> None:
+		pass
+
+	def register_custom(self, name: str, **defaults) -> None:
+		self.register(name, **defaults)
+
+	def __getattr__(self, name: str) -> StubGroup:
+		if name.startswith("__"):
+			raise AttributeError(name)
+		return getattr(StubGroup(self, "GLOBAL", ()), name)
+
+	async def all(self) -> dict:
+		return await StubGroup(self, "GLOBAL", ()).all()
+
+	def guild(self, guild) -> StubGroup:
+		return self.guild_from_id(guild.id)
+
+	def guild_from_id(self, guild_id: int) -> StubGroup:
+		return StubGroup(self, "GUILD", (str(guild_id),))
+
+	def channel(self, channel) -> StubGroup:
+		return self.channel_from_id(channel.id)
+
+	def channel_from_id(self, channel_id: int) -> StubGroup:
+		return StubGroup(self, "CHANNEL", (str(channel_id),))
+
+	def role(self, role) -> StubGroup:
+		return StubGroup(self, "ROLE", (str(role.id),))
+
+	def user(self, user) -> StubGroup:
+		return StubGroup(self, "USER", (str(user.id),))
+
+	def member(self, member) -> StubGroup:
+		return StubGroup(self, "MEMBER", (str(member.guild.id), str(member.id)))
+
+	def custom(self, name: str, *keys) -> StubGroup:
+		return StubGroup(self, name, tuple(str(x) for x in keys))
+
+	async def all_from(self, category: str) -> dict:
+		self.calls["get"] += 1
+		defaults = self.defaults.get(category, {})
+		return {int(key): {**copy.deepcopy(defaults), **copy.deepcopy(value)} for key, value in self.data.get(category, {}).items()}
+
+	async def all_guilds(self) -> dict:
+		return await self.all_from("GUILD")
+
+	async def all_channels(self) -> dict:
+		return await self.all_from("CHANNEL")
+
+	async def all_roles(self) -> dict:
+		return await self.all_from("ROLE")
+
+	async def all_users(self) -> dict:
+		return await self.all_from("USER")
+
+class StubBot(SimpleNamespace):
+	"""The parts of `Red` the cogs touch while loading and handling messages."""
+
+	def __init__(self, **kwargs) -> None:
+		super().__init__(**{'cogs': {}, 'channels': {}, 'extra_events': {}, 'user': None, **kwargs})
+
+	async def wait_until_red_ready(self) -> None:
+		pass
+
+	async def add_cog(self, cog) -> None:
+		self.cogs[type(cog).__name__] = cog
+		if hasattr(cog, "cog_load"):
+			await cog.cog_load()
+
+	def get_cog(self, name: str):
+		return self.cogs.get(name)
+
+	def get_channel(self, channel_id: int):
+		return self.channels.get(channel_id)
+
+	async def is_owner(self, user) -> bool:
+		return False
+
+	async def is_admin(self, member) -> bool:
+		return False
+
+@contextmanager
+def stub_config(configs: list):
+	"""Make `Config.get_conf` hand out `StubConfig` objects, collecting them in `configs`."""
+	from redbot.core import Config
+
+	def get_conf(*args, **kwargs) -> StubConfig:
+		configs.append(StubConfig())
+		return configs[-1]
+
+	with mock.patch.object(Config, "get_conf", get_conf):
+		yield configs
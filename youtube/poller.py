@@ -0,0 +1,244 @@
+import aiohttp
+import asyncio
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator, Optional
+
+log = logging.getLogger("red.mr42-cogs.youtube")
+BANNED_INTERVAL = 900
+FEED_URL = "https://www.youtube.com/feeds/videos.xml?channel_id={}"
+FETCH_CONCURRENCY = 10
+LEASE_RENEW = 10
+LEASE_TTL = 30
+RESTART_DELAY = 15
+SLICES = 64
+YT_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (yid TEXT PRIMARY KEY, slice INTEGER NOT NULL, name TEXT, updated INTEGER NOT NULL, processed TEXT NOT NULL, next_poll INTEGER NOT NULL, forced INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS feeds_slice ON feeds (slice);
+CREATE TABLE IF NOT EXISTS leases (slice INTEGER PRIMARY KEY, owner TEXT, expires REAL NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS workers (owner TEXT PRIMARY KEY, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+def slice_of(yid: str) -> int:
+	return zlib.crc32(yid.encode()) % SLICES
+
+class LeaseStore:
+	"""SQLite database shared by the cog and its poller workers.
+
+	The cog publishes the state of all subscriptions, and every worker holds leases on an equal share of the slices they are hashed into.
+	Leases expire unless renewed, so the slices of a crashed worker are taken over by the others."""
+
+	def __init__(self, path: Path) -> None:
+		self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+		self.lock = threading.Lock()
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.executescript(SCHEMA)
+		self.db.executemany("INSERT OR IGNORE INTO leases (slice) VALUES (?)", [(i,) for i in range(SLICES)])
+
+	@contextmanager
+	def transaction(self) -> Iterator[sqlite3.Connection]:
+		with self.lock:
+			self.db.execute("BEGIN IMMEDIATE")
+			try:
+				yield self.db
+			except BaseException:
+				self.db.execute("ROLLBACK")
+				raise
+			self.db.execute("COMMIT")
+
+	def sync(self, rows: list, interval: int, full: bool = True, banned: bool = False) -> None:
+		"""Publish `(yid, name, updated, processed, next_poll, forced)` rows. A full sync also removes feeds that are not in the rows.
+
+		`banned` tells the workers YouTube blocks our requests, so they stop fetching until the cog lifts it again."""
+		with self.transaction() as db:
+			if full:
+				db.execute("DELETE FROM feeds")
+			db.executemany(
+				"INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?, ?, ?, ?)",
+				[(yid, slice_of(yid), *values) for yid, *values in rows]
+			)
+			db.execute("INSERT OR REPLACE INTO meta VALUES ('interval', ?)", (interval,))
+			db.execute("INSERT OR REPLACE INTO meta VALUES ('banned', ?)", (int(banned),))
+
+	def remove(self, yid: str) -> None:
+		with self.transaction() as db:
+			db.execute("DELETE FROM feeds WHERE yid = ?", (yid,))
+
+	def acquire(self, owner: str, ttl: int = LEASE_TTL) -> list:
+		"""Renew the leases of a worker and balance the slices over all live workers. Returns the slices the worker owns."""
+		now = time.time()
+		with self.transaction() as db:
+			db.execute("INSERT OR REPLACE INTO workers VALUES (?, ?)", (owner, now + ttl))
+			db.execute("DELETE FROM workers WHERE expires <= ?", (now,))
+			share = -(-SLICES // db.execute("SELECT COUNT(*) FROM workers").fetchone()[0])
+			db.execute("UPDATE leases SET expires = ? WHERE owner = ? AND expires > ?", (now + ttl, owner, now))
+			owned = [row[0] for row in db.execute("SELECT slice FROM leases WHERE owner = ? AND expires > ? ORDER BY slice", (owner, now))]
+			if len(owned) > share:
+				db.executemany("UPDATE leases SET owner = NULL, expires = 0 WHERE slice = ?", [(i,) for i in owned[share:]])
+				owned = owned[:share]
+			elif len(owned) < share:
+				free = [row[0] for row in db.execute("SELECT slice FROM leases WHERE expires <= ? ORDER BY slice LIMIT ?", (now, share - len(owned)))]
+				db.executemany("UPDATE leases SET owner = ?, expires = ? WHERE slice = ?", [(owner, now + ttl, i) for i in free])
+				owned += free
+		return owned
+
+	def release(self, owner: str) -> None:
+		with self.transaction() as db:
+			db.execute("DELETE FROM workers WHERE owner = ?", (owner,))
+			db.execute("UPDATE leases SET owner = NULL, expires = 0 WHERE owner = ?", (owner,))
+
+	def due(self, slices: list, now: int) -> list:
+		"""Return the feeds in the given slices that are not backing off."""
+		if not slices:
+			return []
+		with self.lock:
+			return self.db.execute(
+				f"SELECT yid, name, updated, processed, forced FROM feeds WHERE next_poll <= ? AND slice IN ({','.join('?' * len(slices))})",
+				(now, *slices)
+			).fetchall()
+
+	def interval(self) -> int:
+		with self.lock:
+			row = self.db.execute("SELECT value FROM meta WHERE key = 'interval'").fetchone()
+		return row[0] if row else 300
+
+	def banned(self) -> bool:
+		with self.lock:
+			row = self.db.execute("SELECT value FROM meta WHERE key = 'banned'").fetchone()
+		return bool(row and row[0])
+
+class WorkerPool:
+	"""Runs poller workers as subprocesses of the bot and hands their events to the cog, restarting workers that exit."""
+
+	def __init__(self, path: Path, count: int, handler: Callable[[dict], Awaitable[None]]) -> None:
+		self.store = LeaseStore(path)
+		self.path = path
+		self.handler = handler
+		self.procs = {}
+		self.tasks = [asyncio.create_task(self.run_worker(f"worker-{i}")) for i in range(count)]
+
+	async def sync(self, rows: list, interval: int, full: bool = True, banned: bool = False) -> None:
+		await asyncio.get_running_loop().run_in_executor(None, self.store.sync, rows, interval, full, banned)
+
+	async def remove(self, yid: str) -> None:
+		await asyncio.get_running_loop().run_in_executor(None, self.store.remove, yid)
+
+	async def run_worker(self, owner: str) -> None:
+		while True:
+			proc = self.procs[owner] = await asyncio.create_subprocess_exec(
+				sys.executable, __file__, str(self.path), owner,
+				# never written to, the worker exits when it reaches the end, i.e. when the bot is gone
+				stdin=asyncio.subprocess.PIPE,
+				stdout=asyncio.subprocess.PIPE,
+				limit=2 ** 20
+			)
+			while line := await proc.stdout.readline():
+				try:
+					await self.handler(json.loads(line))
+				except Exception:
+					log.exception("Unable to handle an event from poller %s", owner)
+			await proc.wait()
+			log.warning("Poller %s exited with code %s, restarting it in %d seconds", owner, proc.returncode, RESTART_DELAY)
+			await asyncio.sleep(RESTART_DELAY)
+
+	def close(self) -> None:
+		for task in self.tasks:
+			task.cancel()
+		for proc in self.procs.values():
+			if proc.returncode is None:
+				proc.terminate()
+
+def emit(event: dict) -> None:
+	sys.stdout.write(json.dumps(event) + "\n")
+	sys.stdout.flush()
+
+def entry_dict(entry) -> dict:
+	keys = ('author', 'title', 'link', 'published', 'updated', 'summary', 'yt_videoid')
+	return {'author_detail': {'href': entry['author_detail']['href']}, **{key: entry.get(key) for key in keys}}
+
+async def poll(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, feed: tuple, banned: Optional[Callable[[], bool]]) -> None:
+	"""Fetch and parse a feed, and only emit an event when the cog has something to do.
+
+	The fetch is skipped when `banned` says YouTube started blocking our requests while the feed was waiting for its turn."""
+	import feedparser
+
+	yid, name, updated, processed, forced = feed
+	async with semaphore:
+		if banned and banned():
+			return
+		try:
+			async with session.get(FEED_URL.format(yid)) as response:
+				if response.status != 200:
+					return emit({'type': 'error', 'yid': yid, 'status': response.status})
+				data = await response.read()
+		except (aiohttp.ClientError, asyncio.TimeoutError):
+			return
+
+	parsed = feedparser.parse(data)
+	entries = [entry_dict(entry) for entry in parsed['entries'][:4]]
+	title = parsed['feed'].get('title')
+	processed = json.loads(processed)
+	new = any(datetime.strptime(entry['published'], YT_FORMAT).timestamp() > updated and entry['yt_videoid'] not in processed for entry in entries)
+	if forced or new or title != name:
+		emit({'type': 'feed', 'yid': yid, 'feed': {'feed': {'title': title}, 'entries': entries}})
+
+async def parent_exit() -> None:
+	"""Wait for the end of stdin, which the bot holds open for as long as it runs."""
+	loop = asyncio.get_running_loop()
+	reader = asyncio.StreamReader()
+	await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+	while await reader.read(4096):
+		pass
+
+async def work(path: Path, owner: str) -> None:
+	store = LeaseStore(path)
+	slices = []
+	polled = {}
+
+	async def renew() -> None:
+		nonlocal slices
+		while True:
+			slices = store.acquire(owner)
+			await asyncio.sleep(LEASE_RENEW)
+
+	async def run() -> None:
+		semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+		probed = 0
+		async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+			while True:
+				await asyncio.sleep(LEASE_RENEW)
+				now = int(time.time())
+				interval = store.interval()
+				feeds = [feed for feed in store.due(slices, now) if now - polled.get(feed[0], 0) >= interval]
+				if banned := store.banned():
+					# a single request now and then tells the cog when the block is lifted
+					feeds = feeds[:1] if now - probed >= BANNED_INTERVAL else []
+					probed = now if feeds else probed
+				for feed in feeds:
+					polled[feed[0]] = now
+				await asyncio.gather(*(poll(session, semaphore, feed, None if banned else store.banned) for feed in feeds))
+
+	tasks = [asyncio.create_task(parent_exit()), asyncio.create_task(renew()), asyncio.create_task(run())]
+	try:
+		done, _pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+		for task in done:
+			task.result()
+	finally:
+		for task in tasks:
+			task.cancel()
+		store.release(owner)
+
+if __name__ == "__main__":
+	asyncio.run(work(Path(sys.argv[1]), sys.argv[2]))
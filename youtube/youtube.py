@@ -1,9 +1,12 @@
 import aiohttp
+import asyncio
 import discord
-import feedparser
+import functools
+import importlib
+import json
 import logging
+import os
 import re
-import yt_dlp
 
 from contextlib import suppress
 from datetime import datetime
@@ -11,18 +14,25 @@ from discord.ext import tasks
 from typing import NoReturn, Optional, Union
 from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
-from redbot.core.data_manager import bundled_data_path
+from redbot.core.data_manager import bundled_data_path, cog_data_path
 from redbot.core.i18n import Translator, cog_i18n
 from redbot.core.utils.chat_formatting import bold, error, escape, humanize_list, humanize_timedelta, inline, pagify, question, success, text_to_file, warning
 from redbot.core.utils.views import ConfirmView
 from string import Formatter
 from urllib.parse import urlparse
 
+from .poller import WorkerPool
+
 _ = Translator("YouTube", __file__)
 log = logging.getLogger("red.mr42-cogs.youtube")
 YT_COLOR = discord.Colour.from_rgb(255, 0, 0)
 YT_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
 
+@functools.lru_cache(maxsize=None)
+def lazy_import(name: str):
+	"""Import a module on first use, as `yt_dlp` alone takes seconds to load all of its extractors."""
+	return importlib.import_module(name)
+
 def has_feature(feature: str):
 	def predicate(ctx: commands.Context):
 		return ctx.guild and feature.upper() in ctx.guild.features
@@ -35,11 +45,14 @@ class YouTube(commands.Cog):
 	def __init__(self, bot: Red) -> None:
 		self.bot = bot
 		self.config = Config.get_conf(self, identifier=823288853745238067)
-		self.config.register_global(interval=300)
+		self.config.register_global(interval=300, warmup=True, workers=0)
 		self.config.register_guild(maxpages=2)
-		self.config.register_channel(embed=True)
+		self.config.register_channel(embed=True, webhook=False, webhookId=None)
 		self.config.init_custom('subscriptions', 1)
 		self.config.register_custom('subscriptions')
+		self.pool = None
+		self.webhooks = {}
+		self.warmup_task = None
 		self.background_get_new_videos.start()
 
 	@commands.group(aliases=['yt'])
@@ -74,7 +87,7 @@ class YouTube(commands.Cog):
 				if isinstance(feedData, aiohttp.ClientResponse):
 					return await ctx.send(error(_("Error {error} for channel {channel}.").format(error=bold(f"{feedData.status} {feedData.reason}"), channel=bold(yid))))
 
-				feed = feedparser.parse(feedData)
+				feed = lazy_import("feedparser").parse(feedData)
 				feedTitle = feed['feed']['title']
 				try:
 					updated = datetime.strptime(feed['entries'][0]['published'], YT_FORMAT).timestamp()
@@ -262,6 +275,28 @@ class YouTube(commands.Cog):
 			return await ctx.send(warning(_("Embeds have now been enabled for {channel}, but it requires {permissions} to function.").format(channel=channelDiscord.mention, permissions=humanize_list(permcheck))))
 		await ctx.send(success(_("Embeds have now been enabled for {channel}.").format(channel=channelDiscord.mention)))
 
+	@checks.admin_or_permissions(manage_guild=True)
+	@commands.guild_only()
+	@youtube.command()
+	async def webhook(self, ctx: commands.Context, channelDiscord: discord.TextChannel) -> None:
+		"""Toggles between posting new videos through a webhook and as the bot.
+
+		Webhooks have their own rate limits, so announcements in busy servers are not held up by each other.
+		Requires the `manage_webhooks` permission, without it messages are posted as the bot."""
+		if await self.config.channel(channelDiscord).webhook():
+			webhookId = await self.config.channel(channelDiscord).webhookId()
+			await self.config.channel(channelDiscord).webhook.clear()
+			await self.config.channel(channelDiscord).webhookId.clear()
+			with suppress(discord.HTTPException):
+				if webhook := self.webhooks.pop(channelDiscord.id, None) or discord.utils.get(await channelDiscord.webhooks(), id=webhookId):
+					await webhook.delete()
+			return await ctx.send(success(_("From now on I will post new videos in {channel} myself.").format(channel=channelDiscord.mention)))
+
+		await self.config.channel(channelDiscord).webhook.set(True)
+		if not channelDiscord.permissions_for(channelDiscord.guild.me).manage_webhooks:
+			return await ctx.send(warning(_("Webhooks have now been enabled for {channel}, but it requires {permissions} to function.").format(channel=channelDiscord.mention, permissions=inline("manage_webhooks"))))
+		await ctx.send(success(_("Webhooks have now been enabled for {channel}.").format(channel=channelDiscord.mention)))
+
 	@checks.admin_or_permissions(manage_guild=True)
 	@commands.guild_only()
 	@youtube.command()
@@ -405,7 +440,7 @@ class YouTube(commands.Cog):
 			return
 
 		ytFeedData = await self.get_feed(yid)
-		ytFeed = feedparser.parse(ytFeedData)
+		ytFeed = lazy_import("feedparser").parse(ytFeedData)
 		dchans = {str(ctx.channel.id): {'mention': ctx.guild.id, 'message': f"This is a test message for **{{author}}** from the YouTube cog, as requested by {ctx.author.mention}.\n**Sorry for pinging {{mention}}.** I don't do this by default for normal new videos, just for this test. *Or* when explicitly requested."}}
 
 		for entry in ytFeed['entries'][:1][::-1]:
@@ -469,6 +504,38 @@ class YouTube(commands.Cog):
 		self.background_get_new_videos.change_interval(seconds=interval)
 		await ctx.send(success(_("I will now check every {time} for new videos.").format(time=humanize_timedelta(seconds=interval))))
 
+	@checks.is_owner()
+	@youtube.command()
+	async def workers(self, ctx: commands.Context, count: Optional[int]) -> None:
+		"""Set the number of worker processes that check feeds for updates.
+
+		Workers split the subscriptions between them and take over the subscriptions of a worker that stopped.
+		Use 0 to check feeds within the bot itself, which is the default."""
+		if count is None:
+			count = await self.config.workers()
+			return await ctx.send(_("I am currently using {count} worker processes.").format(count=bold(str(count))))
+		elif count not in range(0, (os.cpu_count() or 1) + 1):
+			return await ctx.send(error(_("The number of workers must be between 0 and the number of CPU cores ({cores}).").format(cores=os.cpu_count() or 1)))
+
+		await self.config.workers.set(count)
+		await self.start_workers()
+		if not count:
+			return await ctx.send(success(_("I will now check for new videos within the bot.")))
+		await ctx.send(success(_("I will now check for new videos with {count} worker processes.").format(count=bold(str(count)))))
+
+	@checks.is_owner()
+	@youtube.command()
+	async def warmup(self, ctx: commands.Context, enabled: Optional[bool]) -> None:
+		"""Toggle loading the YouTube libraries in the background once the bot is ready.
+
+		Without it they are loaded when they are first needed, which can stall the bot for a moment."""
+		if enabled is None:
+			enabled = not await self.config.warmup()
+		await self.config.warmup.set(enabled)
+		if enabled:
+			return await ctx.send(success(_("The YouTube libraries will now be loaded in the background after startup.")))
+		await ctx.send(success(_("The YouTube libraries will now be loaded when they are first needed.")))
+
 	@checks.is_owner()
 	@youtube.command(hidden=True)
 	async def migrate(self, ctx: commands.Context) -> None:
@@ -533,79 +600,107 @@ class YouTube(commands.Cog):
 
 	@tasks.loop(minutes=5)
 	async def background_get_new_videos(self) -> NoReturn:
-		for yid in await self.config.custom('subscriptions').get_raw():
-			name = await self.config.custom('subscriptions', yid).name()
-
-			for dchan in await self.config.custom('subscriptions', yid).discord() or []:
-				if not self.bot.get_channel(int(dchan)):
-					await self.config.custom('subscriptions', yid, 'discord', dchan).clear()
-					continue
+		if self.pool:
+			return await self.sync_workers()
 
-			if not (dchans := await self.config.custom('subscriptions', yid).discord()):
-				await self.config.custom('subscriptions', yid).clear()
+		for yid in await self.config.custom('subscriptions').get_raw():
+			if not (sub := await self.get_subscription(yid)):
 				continue
 
-			now = int(datetime.now().timestamp())
-			if errorCount := await self.config.custom('subscriptions', yid).errorCount() or 0:
-				lastTry = await self.config.custom('subscriptions', yid).lastTry()
-				if errorCount in range(3, 9) and now - lastTry < 900 \
-					or errorCount >= 9 and now - lastTry < 3600:
-					continue
+			if int(datetime.now().timestamp()) < self.get_backoff(await self.config.custom('subscriptions', yid).get_raw()):
+				continue
 
 			try:
 				feedData = await self.get_feed(yid)
 			except ConnectionError:
 				continue
 
-			bannedipcount = await self.config.bannedipcount() or 0
 			if isinstance(feedData, aiohttp.ClientResponse):
-				if feedData.status == 403:
-					bannedipcount += 1
-					await self.config.bannedipcount.set(bannedipcount)
+				if await self.handle_feed_error(yid, feedData.status):
+					break
+				continue
 
-					if bannedipcount == 1:
-						self.background_get_new_videos.change_interval(minutes=15)
-						await self.bot.send_to_owners("YouTube returned `403: Forbidden` error, likely due to an IP block. I will try to get the block lifted by limiting requests to 1 every 15 minutes, until the issue is resolved.")
+			await self.handle_feed(yid, *sub, lazy_import("feedparser").parse(feedData))
 
-					break
+	async def get_subscription(self, yid: str) -> Optional[tuple]:
+		"""Forget Discord channels that no longer exist, and return the name and Discord channels of a subscription that still has any."""
+		name = await self.config.custom('subscriptions', yid).name()
 
-				if errorCount >= 14 and now - lastTry < 86400:
-					continue
+		for dchan in await self.config.custom('subscriptions', yid).discord() or []:
+			if not self.bot.get_channel(int(dchan)):
+				await self.config.custom('subscriptions', yid, 'discord', dchan).clear()
+				continue
+
+		if not (dchans := await self.config.custom('subscriptions', yid).discord()):
+			await self.config.custom('subscriptions', yid).clear()
+			return None
+		return name, dchans
+
+	def get_backoff(self, sub: dict) -> int:
+		"""Return the timestamp until which a failing feed is not checked again."""
+		errorCount = sub.get('errorCount') or 0
+		if errorCount in range(3, 9):
+			return sub['lastTry'] + 900
+		if errorCount >= 9:
+			return sub['lastTry'] + 3600
+		return 0
+
+	async def handle_feed_error(self, yid: str, status: int) -> bool:
+		"""Keep track of failing feeds. Returns True when YouTube blocks all further requests."""
+		now = int(datetime.now().timestamp())
+		errorCount = await self.config.custom('subscriptions', yid).errorCount() or 0
+		lastTry = await self.config.custom('subscriptions', yid).lastTry() or 0
+		if status == 403:
+			bannedipcount = await self.config.bannedipcount() or 0
+			bannedipcount += 1
+			await self.config.bannedipcount.set(bannedipcount)
 
-				errorCount += 1
-				await self.config.custom('subscriptions', yid).lastTry.set(now)
-				await self.config.custom('subscriptions', yid).errorCount.set(errorCount)
+			if bannedipcount == 1:
+				self.background_get_new_videos.change_interval(minutes=15)
+				await self.bot.send_to_owners("YouTube returned `403: Forbidden` error, likely due to an IP block. I will try to get the block lifted by limiting requests to 1 every 15 minutes, until the issue is resolved.")
 
-				options = {'extract_flat': True, 'playlist_items': '0', 'quiet': True}
-				with yt_dlp.YoutubeDL(options) as ydl, suppress(Exception):
-					if ydl.extract_info(f"https://www.youtube.com/channel/{yid}", download=False).get('channel_id'):
-						await self.config.custom('subscriptions', yid).errorCount.set(1)
-						continue
+			return True
 
-				if errorCount >= 42:
-					message = _("I'm giving up…") + "\n"
-					message += _("The YouTube channel {ytName} has been gone for a while now.")
-					message += " " + _("I'm deleting it from the configuration.")
-					await self.send_guild_owner_messages(yid, message)
-					await self.config.custom('subscriptions', yid).clear()
-				elif errorCount >= 14 and errorCount%7 == 0 or errorCount == 41:
-					message = _("I'm messaging you, as you are the owner of {guild}.") + "\n"
-					message += _("You have previously subscribed to the YouTube channel {ytName} on your channel {channel}.")
-					message += " " + _("Unfortunately this channel seems to have been removed from YouTube.")
-					message += " " + _("Please feel free to verify this for yourself at {url}.") + "\n\n"
-					message += _("To unsubscribe from this channel, please type `{prefix}youtube unsubscribe {yid}` somewhere __in your server__.")
-					deletionDays = _("1 day") if errorCount == 41 else _("{days} days").format(days=42 - errorCount)
-					message += " " + _("It will be automatically removed from the configuration in {days}.").format(days=bold(deletionDays))
-					message += " " + _("If you do not take any action, I will inform you later again.")
-					await self.send_guild_owner_messages(yid, message)
-				continue
+		if errorCount >= 14 and now - lastTry < 86400:
+			return False
 
-			if bannedipcount > 0:
-				interval = await self.config.interval()
-				self.background_get_new_videos.change_interval(seconds=interval)
-				await self.config.bannedipcount.clear()
-				await self.bot.send_to_owners("YouTube functionality restored: IP block has been lifted.")
+		errorCount += 1
+		await self.config.custom('subscriptions', yid).lastTry.set(now)
+		await self.config.custom('subscriptions', yid).errorCount.set(errorCount)
+
+		options = {'extract_flat': True, 'playlist_items': '0', 'quiet': True}
+		with lazy_import("yt_dlp").YoutubeDL(options) as ydl, suppress(Exception):
+			if ydl.extract_info(f"https://www.youtube.com/channel/{yid}", download=False).get('channel_id'):
+				await self.config.custom('subscriptions', yid).errorCount.set(1)
+				return False
+
+		if errorCount >= 42:
+			message = _("I'm giving up…") + "\n"
+			message += _("The YouTube channel {ytName} has been gone for a while now.")
+			message += " " + _("I'm deleting it from the configuration.")
+			await self.send_guild_owner_messages(yid, message)
+			await self.config.custom('subscriptions', yid).clear()
+		elif errorCount >= 14 and errorCount%7 == 0 or errorCount == 41:
+			message = _("I'm messaging you, as you are the owner of {guild}.") + "\n"
+			message += _("You have previously subscribed to the YouTube channel {ytName} on your channel {channel}.")
+			message += " " + _("Unfortunately this channel seems to have been removed from YouTube.")
+			message += " " + _("Please feel free to verify this for yourself at {url}.") + "\n\n"
+			message += _("To unsubscribe from this channel, please type `{prefix}youtube unsubscribe {yid}` somewhere __in your server__.")
+			deletionDays = _("1 day") if errorCount == 41 else _("{days} days").format(days=42 - errorCount)
+			message += " " + _("It will be automatically removed from the configuration in {days}.").format(days=bold(deletionDays))
+			message += " " + _("If you do not take any action, I will inform you later again.")
+			await self.send_guild_owner_messages(yid, message)
+		return False
+
+	async def handle_feed(self, yid: str, name: str, dchans: dict, feed: dict) -> None:
+		"""Announce new videos from a successfully fetched feed, and keep track of renamed channels."""
+		if await self.config.bannedipcount():
+			interval = await self.config.interval()
+			self.background_get_new_videos.change_interval(seconds=interval)
+			await self.config.bannedipcount.clear()
+			await self.bot.send_to_owners("YouTube functionality restored: IP block has been lifted.")
 
+		if errorCount := await self.config.custom('subscriptions', yid).errorCount() or 0:
 			if errorCount >= 14:
 				message = _("I'm messaging you, as you are the owner of {guild}.") + "\n"
 				message += _("Remember when I said the YouTube channel {ytName} was unavailable at the time? Well, it's back now!")
@@ -613,32 +708,65 @@ class YouTube(commands.Cog):
 				message += _("Please feel free to verify this for yourself at {url}.")
 				await self.send_guild_owner_messages(yid, message)
 
-			if errorCount:
-				await self.config.custom('subscriptions', yid).errorCount.clear()
-				await self.config.custom('subscriptions', yid).lastTry.clear()
-
-			feed = feedparser.parse(feedData)
-			if name != feed['feed']['title']:
+			await self.config.custom('subscriptions', yid).errorCount.clear()
+			await self.config.custom('subscriptions', yid).lastTry.clear()
+
+		if name != feed['feed']['title']:
+			for dchan in dchans:
+				if not (oldname := await self.config.custom('subscriptions', yid, 'discord', dchan).oldname()):
+					await self.config.custom('subscriptions', yid, 'discord', dchan).oldname.set(name)
+				elif oldname == feed['feed']['title']:
+					await self.config.custom('subscriptions', yid, 'discord', dchan).oldname.clear()
+			await self.config.custom('subscriptions', yid).name.set(feed['feed']['title'])
+
+		processed = await self.config.custom('subscriptions', yid).processed() or []
+		processedOrig = processed.copy()
+		upd = await self.config.custom('subscriptions', yid).updated()
+		for entry in feed['entries'][:4][::-1]:
+			published = datetime.strptime(entry['published'], YT_FORMAT)
+			if published.timestamp() > upd and entry['yt_videoid'] not in processed:
+				processed.insert(0, entry['yt_videoid'])
 				for dchan in dchans:
-					if not (oldname := await self.config.custom('subscriptions', yid, 'discord', dchan).oldname()):
-						await self.config.custom('subscriptions', yid, 'discord', dchan).oldname.set(name)
-					elif oldname == feed['feed']['title']:
-						await self.config.custom('subscriptions', yid, 'discord', dchan).oldname.clear()
-				await self.config.custom('subscriptions', yid).name.set(feed['feed']['title'])
-
-			processed = await self.config.custom('subscriptions', yid).processed() or []
-			processedOrig = processed.copy()
-			upd = await self.config.custom('subscriptions', yid).updated()
-			for entry in feed['entries'][:4][::-1]:
-				published = datetime.strptime(entry['published'], YT_FORMAT)
-				if published.timestamp() > upd and entry['yt_videoid'] not in processed:
-					processed.insert(0, entry['yt_videoid'])
-					for dchan in dchans:
-						await self.send_message(entry, self.bot.get_channel(int(dchan)), dchans)
-
-			if processed != processedOrig:
-				await self.config.custom('subscriptions', yid).processed.set(processed[:6])
-				await self.config.custom('subscriptions', yid).updated.set(int(published.timestamp()))
+					await self.send_message(entry, self.bot.get_channel(int(dchan)), dchans)
+
+		if processed != processedOrig:
+			await self.config.custom('subscriptions', yid).processed.set(processed[:6])
+			await self.config.custom('subscriptions', yid).updated.set(int(published.timestamp()))
+
+	async def start_workers(self) -> None:
+		if self.pool:
+			self.pool.close()
+			self.pool = None
+		if count := await self.config.workers():
+			self.pool = WorkerPool(cog_data_path(self) / "poller.sqlite3", count, self.handle_worker_event)
+			await self.sync_workers()
+
+	async def sync_workers(self, yid: Optional[str] = None) -> None:
+		"""Publish the state of all subscriptions, or of a single one, to the poller workers."""
+		if not self.pool:
+			return
+		loop = self.background_get_new_videos
+		interval = int(loop.seconds + 60 * loop.minutes + 3600 * loop.hours)
+		banned = bool(await self.config.bannedipcount())
+		rows = []
+		for sid in [yid] if yid else await self.config.custom('subscriptions').get_raw():
+			if not yid and not await self.get_subscription(sid):
+				continue
+			if not (sub := await self.config.custom('subscriptions', sid).get_raw()):
+				await self.pool.remove(sid)
+			else:
+				rows.append((sid, sub.get('name'), sub.get('updated') or 0, json.dumps(sub.get('processed') or []), self.get_backoff(sub), int(banned or bool(sub.get('errorCount')))))
+		await self.pool.sync(rows, interval, full=not yid, banned=banned)
+
+	async def handle_worker_event(self, event: dict) -> None:
+		yid = event['yid']
+		if not (sub := await self.get_subscription(yid)):
+			return await self.pool.remove(yid)
+		if event['type'] == 'error':
+			await self.handle_feed_error(yid, event['status'])
+		else:
+			await self.handle_feed(yid, *sub, event['feed'])
+		await self.sync_workers(yid)
 
 	async def send_guild_owner_messages(self, yid: str, message: str) -> NoReturn:
 		for dchan in (dchans := await self.config.custom('subscriptions', yid).discord()):
@@ -661,8 +789,9 @@ class YouTube(commands.Cog):
 			with suppress(discord.Forbidden, discord.HTTPException):
 				await channel.guild.owner.send(msg)
 
-	async def send_message(self, entry: feedparser, channel: discord.TextChannel, dchans: dict) -> None:
-		if not channel.permissions_for(channel.guild.me).send_messages:
+	async def send_message(self, entry: dict, channel: discord.TextChannel, dchans: dict) -> None:
+		webhook = await self.get_webhook(channel)
+		if not webhook and not channel.permissions_for(channel.guild.me).send_messages:
 			return
 
 		dchan = str(channel.id)
@@ -690,7 +819,7 @@ class YouTube(commands.Cog):
 			custom = custom.format(**options)
 
 		message = None
-		if channel.permissions_for(channel.guild.me).embed_links and channel.permissions_for(channel.guild.me).attach_files and await self.config.channel(channel).embed():
+		if channel.permissions_for(channel.guild.me).embed_links and (webhook or channel.permissions_for(channel.guild.me).attach_files) and await self.config.channel(channel).embed():
 			embed = discord.Embed()
 			embed.colour = YT_COLOR
 			embed.title = entry['title']
@@ -699,26 +828,72 @@ class YouTube(commands.Cog):
 			embed.set_author(name=entry['author'], url=entry['author_detail']['href'])
 			embed.set_image(url=f"https://i.ytimg.com/vi/{entry['yt_videoid']}/hqdefault.jpg")
 			embed.timestamp = datetime.strptime(entry['updated'], YT_FORMAT)
-			icon = discord.File(bundled_data_path(self) / "youtube_social_icon_red.png", filename="youtube.png")
-			embed.set_footer(text="YouTube", icon_url="attachment://youtube.png")
 			with suppress(discord.DiscordServerError):
-				message = await channel.send(role, file=icon, embed=embed, allowed_mentions=mentions)
+				message = await self.deliver(channel, webhook, role, embed=embed, allowed_mentions=mentions)
 		else:
 			description = custom or _("New video from {author}: {title}").format(author=bold(entry['author']), title=bold(entry['title']))
 			if role and dchans.get(dchan).get('message', "").find("{mention}") == -1:
 				description = f"{role} {description}"
 			with suppress(discord.DiscordServerError):
-				message = await channel.send(content=f"{description}\nhttps://youtu.be/{entry['yt_videoid']}", allowed_mentions=mentions)
+				message = await self.deliver(channel, webhook, f"{description}\nhttps://youtu.be/{entry['yt_videoid']}", allowed_mentions=mentions)
 
 		if isinstance(message, discord.Message) and dchans.get(dchan).get('publish') and channel.is_news():
 			with suppress(discord.HTTPException):
 				await message.publish()
 
+	async def get_webhook(self, channel: discord.TextChannel) -> Optional[discord.Webhook]:
+		"""Return the webhook of a channel that has webhook delivery enabled, creating it when needed."""
+		if not await self.config.channel(channel).webhook() or not channel.permissions_for(channel.guild.me).manage_webhooks:
+			return None
+		if (webhook := self.webhooks.get(channel.id)) is None:
+			# only reuse the webhook this cog created, as other cogs can own webhooks of the bot in the same channel
+			webhookId = await self.config.channel(channel).webhookId()
+			with suppress(discord.HTTPException):
+				webhook = discord.utils.find(lambda w: w.id == webhookId and w.token, await channel.webhooks()) if webhookId else None
+				if not webhook:
+					icon = (bundled_data_path(self) / "youtube_social_icon_red.png").read_bytes()
+					webhook = await channel.create_webhook(name="YouTube", avatar=icon, reason=_("Webhook delivery for YouTube notifications"))
+					await self.config.channel(channel).webhookId.set(webhook.id)
+				self.webhooks[channel.id] = webhook
+		return webhook
+
+	async def deliver(self, channel: discord.TextChannel, webhook: Optional[discord.Webhook], content: Optional[str], embed: Optional[discord.Embed] = None, **kwargs) -> Optional[discord.Message]:
+		"""Send a message through a webhook, which has its own rate limits and shows its avatar as footer icon, or as the bot otherwise."""
+		if webhook:
+			if embed:
+				embed.set_footer(text="YouTube", icon_url=webhook.display_avatar.url)
+				kwargs['embed'] = embed
+			try:
+				return await webhook.send(content, wait=True, **kwargs)
+			except (discord.NotFound, discord.Forbidden):
+				self.webhooks.pop(channel.id, None)
+				if not channel.permissions_for(channel.guild.me).send_messages:
+					return None
+
+		if embed and channel.permissions_for(channel.guild.me).attach_files:
+			embed.set_footer(text="YouTube", icon_url="attachment://youtube.png")
+			kwargs.update(embed=embed, file=discord.File(bundled_data_path(self) / "youtube_social_icon_red.png", filename="youtube.png"))
+		elif embed:
+			embed.set_footer(text="YouTube")
+			kwargs['embed'] = embed
+		return await channel.send(content, **kwargs)
+
 	@background_get_new_videos.before_loop
 	async def background_get_new_videos_wait_for_red(self) -> NoReturn:
 		await self.bot.wait_until_red_ready()
 		interval = await self.config.interval()
 		self.background_get_new_videos.change_interval(seconds=interval)
+		if await self.config.warmup():
+			loop = asyncio.get_running_loop()
+			await loop.run_in_executor(None, lazy_import, "feedparser")
+			self.warmup_task = loop.run_in_executor(None, lazy_import, "yt_dlp")
+			self.warmup_task.add_done_callback(self.warmup_done)
+		await self.start_workers()
+
+	@staticmethod
+	def warmup_done(task: asyncio.Future) -> None:
+		if not task.cancelled() and (error := task.exception()):
+			log.warning("Unable to load yt_dlp in the background", exc_info=error)
 
 	@background_get_new_videos.error
 	async def background_get_new_videos_error(self, error) -> NoReturn:
@@ -745,7 +920,7 @@ class YouTube(commands.Cog):
 
 		if urlparse(url).hostname in {'youtu.be', 'youtube.com', 'www.youtube.com', 'music.youtube.com'}:
 			options = {'extract_flat': False, 'playlist_items': '0'}
-			with yt_dlp.YoutubeDL(options) as ydl, suppress(Exception):
+			with lazy_import("yt_dlp").YoutubeDL(options) as ydl, suppress(Exception):
 				return ydl.extract_info(url, download=False).get('channel_id')
 
 		await ctx.send(error(_("Unable to retrieve channel id from {channel}.").format(channel=bold(f"<{url}>"))))
@@ -787,3 +962,7 @@ class YouTube(commands.Cog):
 
 	def cog_unload(self):
 		self.background_get_new_videos.cancel()
+		if self.warmup_task:
+			self.warmup_task.cancel()
+		if self.pool:
+			self.pool.close()
@@ -0,0 +1,68 @@
+import time
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+
+BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000, float('inf'))
+
+class Histogram:
+	"""Latency histogram in milliseconds with fixed exponential buckets."""
+	__slots__ = ('buckets', 'count', 'total', 'max')
+
+	def __init__(self) -> None:
+		self.buckets = [0] * len(BUCKETS)
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+
+	def observe(self, ms: float) -> None:
+		self.buckets[next(i for i, bound in enumerate(BUCKETS) if ms <= bound)] += 1
+		self.count += 1
+		self.total += ms
+		self.max = max(self.max, ms)
+
+	def percentile(self, q: float) -> float:
+		"""Return the upper bound of the bucket holding the given percentile."""
+		seen = 0
+		for bound, count in zip(BUCKETS, self.buckets):
+			seen += count
+			if seen and seen >= q / 100 * self.count:
+				return min(bound, self.max)
+		return 0.0
+
+	def to_dict(self) -> dict:
+		return {
+			'count': self.count,
+			'mean': self.total / self.count if self.count else 0.0,
+			'p50': self.percentile(50),
+			'p99': self.percentile(99),
+			'max': self.max,
+			'buckets': {str(bound): count for bound, count in zip(BUCKETS, self.buckets) if count}
+		}
+
+class Stats:
+	"""Counters and latency histograms, kept in memory since the cog was loaded."""
+
+	def __init__(self) -> None:
+		self.started = time.time()
+		self.counters = Counter()
+		self.histograms = defaultdict(Histogram)
+
+	def incr(self, name: str, amount: int = 1) -> None:
+		self.counters[name] += amount
+
+	@contextmanager
+	def timer(self, name: str) -> Iterator[None]:
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.histograms[name].observe((time.perf_counter() - start) * 1000)
+
+	def to_dict(self) -> dict:
+		return {
+			'uptime': int(time.time() - self.started),
+			'counters': dict(self.counters),
+			'latency': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+		}
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import struct
+import threading
+
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Iterator, Optional
+
+RECORD = struct.Struct("<11sxQQI")  # video ID, padding, message ID, channel ID, timestamp
+KEY_SIZE = 11
+
+class CompactIndex(MutableMapping):
+	"""Sorted array of fixed-width records, mapping video IDs to `{'msg': id, 'chan': id, 'time': ts}`.
+
+	Every link costs 32 bytes and lookups are a binary search over the video IDs."""
+	__slots__ = ('data', 'dirty')
+
+	def __init__(self, data: bytes = b"") -> None:
+		self.data = bytearray(data)
+		self.dirty = False
+
+	def __len__(self) -> int:
+		return len(self.data) // RECORD.size
+
+	def __iter__(self) -> Iterator[str]:
+		for offset in range(0, len(self.data), RECORD.size):
+			yield self.data[offset:offset + KEY_SIZE].decode()
+
+	def __contains__(self, yid: object) -> bool:
+		return isinstance(yid, str) and self._find(yid)[1]
+
+	def __getitem__(self, yid: str) -> dict:
+		pos, found = self._find(yid)
+		if not found:
+			raise KeyError(yid)
+		_, msg, chan, time = RECORD.unpack_from(self.data, pos * RECORD.size)
+		return {'msg': msg, 'chan': chan, 'time': time}
+
+	def __setitem__(self, yid: str, entry: dict) -> None:
+		pos, found = self._find(yid)
+		record = RECORD.pack(self._key(yid), entry['msg'], entry.get('chan') or 0, entry['time'])
+		offset = pos * RECORD.size
+		if found:
+			self.data[offset:offset + RECORD.size] = record
+		else:
+			self.data[offset:offset] = record
+		self.dirty = True
+
+	def __delitem__(self, yid: str) -> None:
+		pos, found = self._find(yid)
+		if not found:
+			raise KeyError(yid)
+		del self.data[pos * RECORD.size:(pos + 1) * RECORD.size]
+		self.dirty = True
+
+	def prune(self, before: int) -> int:
+		"""Remove all records older than the given timestamp and return how many were removed."""
+		kept = bytearray()
+		for offset in range(0, len(self.data), RECORD.size):
+			if RECORD.unpack_from(self.data, offset)[3] >= before:
+				kept += self.data[offset:offset + RECORD.size]
+		removed = len(self) - len(kept) // RECORD.size
+		if removed:
+			self.data = kept
+			self.dirty = True
+		return removed
+
+	def _key(self, yid: str) -> bytes:
+		key = yid.encode()
+		if len(key) != KEY_SIZE:
+			raise ValueError(f"Invalid video ID: {yid}")
+		return key
+
+	def _find(self, yid: str) -> tuple:
+		key = self._key(yid)
+		lo, hi = 0, len(self)
+		while lo < hi:
+			mid = (lo + hi) // 2
+			offset = mid * RECORD.size
+			if self.data[offset:offset + KEY_SIZE] < key:
+				lo = mid + 1
+			else:
+				hi = mid
+		offset = lo * RECORD.size
+		return lo, self.data[offset:offset + KEY_SIZE] == key
+
+class CompactStore:
+	"""Keeps a `CompactIndex` per scope in memory, persisted to one file per scope."""
+
+	def __init__(self, path: Path) -> None:
+		self.path = path
+		self.path.mkdir(parents=True, exist_ok=True)
+		self.indexes = {}
+		self.lock = threading.Lock()
+
+	def get(self, scope: str) -> CompactIndex:
+		if (index := self.indexes.get(scope)) is None:
+			file = self.file(scope)
+			index = self.indexes[scope] = CompactIndex(file.read_bytes() if file.exists() else b"")
+		return index
+
+	async def set(self, scope: str, messages: Optional[MutableMapping]) -> CompactIndex:
+		"""Replace the index of a scope, packing the records in a worker thread as that takes long for big histories."""
+		items = list((messages or {}).items())
+		data = await asyncio.get_running_loop().run_in_executor(None, self.pack, items)
+		index = self.indexes[scope] = CompactIndex(data)
+		index.dirty = True
+		return index
+
+	@staticmethod
+	def pack(items: list) -> bytearray:
+		data = bytearray()
+		for yid, entry in sorted(items):
+			if len(key := yid.encode()) == KEY_SIZE:
+				data += RECORD.pack(key, entry['msg'], entry.get('chan') or 0, entry['time'])
+		return data
+
+	def clear(self, scope: str) -> None:
+		# wait for a running flush, which would otherwise write the file again after it was removed
+		with self.lock:
+			self.indexes.pop(scope, None)
+			self.file(scope).unlink(missing_ok=True)
+
+	def file(self, scope: str) -> Path:
+		return self.path / f"{scope}.bin"
+
+	async def flush(self) -> None:
+		"""Write all changed indexes to disk without blocking the event loop."""
+		await asyncio.get_running_loop().run_in_executor(None, self.write, self.snapshot())
+
+	def flush_sync(self) -> None:
+		self.write(self.snapshot())
+
+	def snapshot(self) -> list:
+		changes = []
+		for scope, index in self.indexes.items():
+			if index.dirty:
+				changes.append((scope, index, bytes(index.data)))
+				index.dirty = False
+		return changes
+
+	def write(self, changes: list) -> None:
+		with self.lock:
+			for scope, index, data in changes:
+				# skip indexes that were cleared or replaced since the snapshot
+				if self.indexes.get(scope) is not index:
+					continue
+				file = self.file(scope)
+				tmp = file.with_suffix(".tmp")
+				tmp.write_bytes(data)
+				os.replace(tmp, file)
@@ -1,17 +1,35 @@
+import asyncio
 import contextlib
 import discord
+import heapq
+import json
+import logging
 import re
+import time
 
 from datetime import datetime, timedelta
 from discord.ext import tasks
 from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils.chat_formatting import bold, error, humanize_list, success, underline, warning
-from typing import NoReturn
-from urllib.parse import urlparse, parse_qs
+from redbot.core.utils.chat_formatting import bold, box, error, humanize_list, humanize_timedelta, inline, success, text_to_file, underline, warning
+from typing import AsyncIterator, Callable, MutableMapping, NoReturn, Optional
+
+from .links import find_links
+from .stats import Stats
+from .store import CompactStore
 
 _ = Translator("YouTube", __file__)
+log = logging.getLogger("red.mr42-cogs.ytdedup")
+BACKFILL_CHECKPOINT = 500
+BACKFILL_REPORT_INTERVAL = 5
+BACKFILL_CONCURRENCY = 3
+BULK_DELETE_AGE = timedelta(days=14, minutes=-5)
+DELETE_DELAY = 2
+NOTICE_WINDOW = 60
+FLUSH_DELAY = 10
+GROUP_REGEX = re.compile(r"[-_A-Za-z0-9]{1,32}")
 
 @cog_i18n(_)
 class YouTubeDeDup(commands.Cog):
@@ -20,11 +38,29 @@ class YouTubeDeDup(commands.Cog):
 	def __init__(self, bot: Red) -> None:
 		self.bot = bot
 		self.config = Config.get_conf(self, identifier=823288853745238067)
-		self.config.register_guild(history=7, notify=True)
-		default_channel_settings = {"messages": {}}
+		self.config.register_global(storage="config")
+		self.config.register_guild(history=7, notify=True, scope="channel")
+		default_channel_settings = {"messages": {}, "backfill": None, "group": None}
 		self.config.register_channel(**default_channel_settings)
+		self.config.init_custom("index", 1)
+		self.config.register_custom("index", messages={})
+		self.backfills = {}
+		self.backfill_indexes = {}
+		self.backfill_semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+		self.deletion_queue = {}
+		self.deletion_tasks = {}
+		self.notice_queue = {}
+		self.notified = {}
+		self.compact = None
+		self.flush_task = None
+		self.stats = Stats()
+		self.watched = None
 		self.background_clean.start()
 
+	async def cog_load(self) -> None:
+		if await self.config.storage() == "compact":
+			self.compact = CompactStore(cog_data_path(self) / "history")
+
 	@commands.group(aliases=['ytdd'])
 	async def ytdedup(self, ctx: commands.Context) -> NoReturn:
 		"""Remove duplicate YouTube links in specified channels."""
@@ -48,7 +84,7 @@ class YouTubeDeDup(commands.Cog):
 		if perm:
 			return await ctx.send(error(_("I don't have permission to {perm} in {channel}.").format(perm=humanize_list(perm), channel=channel.mention)))
 
-		await self.get_message_history(ctx, channel)
+		await self.get_message_history(ctx, [channel])
 		await ctx.send(success(_("The channel {channel} will now be monitored for duplicate YouTube links.").format(channel=channel.mention)))
 
 	@checks.admin_or_permissions(manage_guild=True)
@@ -59,7 +95,15 @@ class YouTubeDeDup(commands.Cog):
 		if channel.id not in await self.config.all_channels():
 			return await ctx.send(warning(_("The channel {channel} is not being watched.").format(channel=channel.mention)))
 
+		scope = await self.get_scope(channel)
+		if task := self.backfills.get(scope):
+			task.cancel()
+		if scope == str(channel.id):
+			await self.clear_index(scope)
+		else:
+			await self.forget_channel(scope, channel.id)
 		await self.config.channel(channel).clear()
+		self.watched = None
 		await ctx.send(success(_("The channel {channel} will no longer be monitored for duplicate YouTube links.").format(channel=channel.mention)))
 
 	@checks.admin_or_permissions(manage_guild=True)
@@ -74,8 +118,8 @@ class YouTubeDeDup(commands.Cog):
 		await self.config.guild(ctx.guild).history.set(history)
 
 		if prevHistory < history:
-			for channel in [x for x in ctx.guild.channels if x.id in await self.config.all_channels()]:
-				await self.get_message_history(ctx, channel)
+			watched = await self.config.all_channels()
+			await self.get_message_history(ctx, [x for x in ctx.guild.text_channels if x.id in watched])
 
 		days = _("1 day") if history == 1 else _("{history} days").format(history=history)
 		await ctx.send(success(_("I will keep message history for {days}.").format(days=bold(days))))
@@ -91,78 +135,467 @@ class YouTubeDeDup(commands.Cog):
 		action = _("enabled") if notify else _("disabled")
 		await ctx.send(success(_("User notification has been {action}.").format(action=action)))
 
+	@checks.admin_or_permissions(manage_guild=True)
+	@commands.guild_only()
+	@ytdedup.command()
+	async def scope(self, ctx: commands.Context, scope: Optional[str]) -> None:
+		"""Set where duplicates are looked for.
+
+		`channel` checks every watched channel on its own. `group` shares the history between channels in the same group, see `[p]ytdedup group`. `guild` shares the history between all watched channels in this server.
+
+		Default is `channel`."""
+		current = await self.config.guild(ctx.guild).scope()
+		if scope is None:
+			return await ctx.send(_("Duplicates are currently looked for per {scope}.").format(scope=inline(current)))
+
+		scope = scope.lower()
+		if scope not in {"channel", "group", "guild"}:
+			return await ctx.send(error(_("Unknown scope: {scope}").format(scope=scope)))
+		if scope == current:
+			return await ctx.send(warning(_("Duplicates are already looked for per {scope}.").format(scope=inline(scope))))
+
+		watched = await self.config.all_channels()
+		channels = [x for x in ctx.guild.text_channels if x.id in watched]
+		previous = {await self.get_scope(channel) for channel in channels}
+		await self.config.guild(ctx.guild).scope.set(scope)
+		for index in previous:
+			await self.clear_index(index)
+		await self.get_message_history(ctx, channels)
+		await ctx.send(success(_("Duplicates will now be looked for per {scope}.").format(scope=inline(scope))))
+
+	@checks.admin_or_permissions(manage_guild=True)
+	@commands.guild_only()
+	@ytdedup.command()
+	async def group(self, ctx: commands.Context, channel: discord.TextChannel, name: Optional[str]) -> None:
+		"""Add a watched channel to a group, or remove it from its group when no name is given.
+
+		Channels in the same group share their history when the scope is set to `group`."""
+		if channel.id not in await self.config.all_channels():
+			return await ctx.send(warning(_("The channel {channel} is not being watched.").format(channel=channel.mention)))
+		if name and not GROUP_REGEX.fullmatch(name):
+			return await ctx.send(error(_("Group names can only contain letters, numbers, dashes and underscores.")))
+
+		previous = await self.get_scope(channel)
+		await self.config.channel(channel).group.set(name)
+		if previous != await self.get_scope(channel):
+			if previous == str(channel.id):
+				await self.clear_index(previous)
+			else:
+				await self.forget_channel(previous, channel.id)
+			await self.get_message_history(ctx, [channel])
+
+		if name:
+			return await ctx.send(success(_("The channel {channel} is now part of the group {name}.").format(channel=channel.mention, name=inline(name))))
+		await ctx.send(success(_("The channel {channel} is no longer part of a group.").format(channel=channel.mention)))
+
+	@checks.is_owner()
+	@ytdedup.command()
+	async def storage(self, ctx: commands.Context, backend: Optional[str]) -> None:
+		"""Set how the link history is stored.
+
+		`config` keeps the history in the bot's configuration. `compact` keeps it in a binary file per channel, which takes a fraction of the memory and disk space for long histories.
+
+		Default is `config`."""
+		current = await self.config.storage()
+		if backend is None:
+			return await ctx.send(_("The link history is currently stored using {backend}.").format(backend=inline(current)))
+
+		backend = backend.lower()
+		if backend not in {"config", "compact"}:
+			return await ctx.send(error(_("Unknown storage: {backend}").format(backend=backend)))
+		if backend == current:
+			return await ctx.send(warning(_("The link history is already stored using {backend}.").format(backend=inline(backend))))
+
+		async with ctx.typing():
+			indexes = {scope: dict(await self.get_index(scope)) for scope in await self.get_scopes()}
+			previous = self.compact
+			self.compact = CompactStore(cog_data_path(self) / "history") if backend == "compact" else None
+			for scope, messages in indexes.items():
+				await self.set_index(scope, messages)
+				if previous:
+					previous.clear(scope)
+			await self.config.storage.set(backend)
+		await ctx.send(success(_("The link history is now stored using {backend}.").format(backend=inline(backend))))
+
+	@checks.is_owner()
+	@ytdedup.command(name="stats")
+	async def stats_command(self, ctx: commands.Context, raw: bool = False) -> None:
+		"""Show statistics and listener latency since the cog was loaded.
+
+		Use `[p]ytdedup stats True` to receive all statistics as a JSON file."""
+		data = self.stats.to_dict()
+		data['indexes'] = {scope: len(await self.get_index(scope)) for scope in sorted(await self.get_scopes())}
+		data['queued_deletions'] = sum(len(pending) for pending in self.deletion_queue.values())
+		data['running_backfills'] = len(self.backfills)
+		if raw:
+			return await ctx.send(file=text_to_file(json.dumps(data, indent=2), "ytdedup-stats.json"))
+
+		counters = data['counters']
+		links = counters.get('links', 0)
+		lines = [
+			_("Uptime: {time}").format(time=humanize_timedelta(seconds=data['uptime']) or _("just now")),
+			_("Messages checked: {count} ({rate:.2f}/s)").format(count=counters.get('messages', 0), rate=counters.get('messages', 0) / max(data['uptime'], 1)),
+			_("Links checked: {count}").format(count=links),
+			_("Duplicates found: {count} ({rate:.1%})").format(count=counters.get('duplicates', 0), rate=counters.get('duplicates', 0) / links if links else 0),
+			_("Messages deleted: {count}").format(count=counters.get('deleted', 0)),
+			_("Queued deletions: {count}").format(count=data['queued_deletions']),
+			_("Running backfills: {count}").format(count=data['running_backfills']),
+			_("Expired links removed: {count}").format(count=counters.get('expired', 0)),
+			_("Indexed links: {count} in {scopes} indexes").format(count=sum(data['indexes'].values()), scopes=len(data['indexes'])),
+			"",
+		]
+		for name, latency in data['latency'].items():
+			lines.append(f"{name}: n={latency['count']} p50={latency['p50']:g}ms p99={latency['p99']:g}ms max={latency['max']:.1f}ms")
+		await ctx.send(box("\n".join(lines)))
+
 	@commands.Cog.listener()
 	async def on_message(self, message: discord.Message) -> None:
-		if message.channel.id in await self.config.all_channels():
-			await self.process_message(message)
+		with self.stats.timer("listener"):
+			if message.channel.id in await self.get_watched():
+				await self.process_message(message)
+
+	async def get_watched(self) -> set:
+		"""Return the IDs of all watched channels, without copying all their settings from Config for every message."""
+		if self.watched is None:
+			self.watched = set(await self.config.all_channels())
+		return self.watched
 
 	@tasks.loop(minutes=30)
 	async def background_clean(self) -> None:
+		with self.stats.timer("cleanup"):
+			await self.clean_history()
+
+	async def clean_history(self) -> None:
+		scopes = {}
 		for chan in await self.config.all_channels():
 			if channel := self.bot.get_channel(chan):
-				days = await self.config.guild(channel.guild).history()
-				messages = await self.config.channel(channel).messages()
-				for message in messages:
-					if messages.get(message).get('time') < int(datetime.timestamp(datetime.now() - timedelta(days=days))):
-						await getattr(self.config.channel(channel).messages, message).clear()
+				scopes[await self.get_scope(channel)] = await self.config.guild(channel.guild).history()
 			else:
+				await self.clear_index(str(chan))
 				await self.config.channel_from_id(chan).clear()
+				self.watched = None
+
+		for scope, days in scopes.items():
+			cutoff = int(datetime.timestamp(datetime.now() - timedelta(days=days)))
+			if self.compact:
+				if expired := self.compact.get(scope).prune(cutoff):
+					self.stats.incr('expired', expired)
+					self.schedule_flush()
+				continue
+
+			messages = await self.get_index(scope)
+			if expired := len(messages) - len(kept := {yid: entry for yid, entry in messages.items() if entry.get('time') >= cutoff}):
+				self.stats.incr('expired', expired)
+				await self.set_index(scope, kept)
 
 	@background_clean.before_loop
 	async def background_clean_wait_for_red(self) -> NoReturn:
 		await self.bot.wait_until_red_ready()
+		scopes = {}
+		for chan, data in (await self.config.all_channels()).items():
+			if data.get('backfill') and (channel := self.bot.get_channel(chan)):
+				scopes.setdefault(await self.get_scope(channel), []).append(channel)
+		for scope, channels in scopes.items():
+			days = await self.config.guild(channels[0].guild).history()
+			self.start_backfill(scope, channels, days, resume=True)
 
 	async def process_message(self, message: discord.Message) -> None:
-		if embeds := message.embeds:
-			for embed in embeds:
-				await self.process_vid(embed.url, message)
-		elif text := message.content:
-			links = re.findall(r'(https?://\S+/\S+[a-zA-Z0-9])', text)
-			for link in links:
-				await self.process_vid(link, message)
-
-	async def process_vid(self, url: str, message: discord.Message) -> None:
-		if yid := self.get_yid(url):
-			channel = message.channel
-			messages = await self.config.channel(channel).messages()
-
-			if channel.permissions_for(message.guild.me).manage_messages and yid in [message for message in messages]:
-				rmmsg = message
-				if message.author.bot:
-					with contextlib.suppress(discord.NotFound):
-						rmmsg = await channel.fetch_message(messages.get(yid).get('msg'))
-
-				await rmmsg.delete()
-				if rmmsg is message and not message.author.bot and await self.config.guild(channel.guild).notify():
-					txt = _("Hello {name}. I have deleted your link, as it was already posted here recently.").format(name=message.author.mention)
-					await channel.send(content=warning(txt), delete_after=10)
-
-			newVid = {
-				'msg': message.id,
-				'time': int(message.created_at.timestamp())
-			}
-			obj = getattr(self.config.channel(channel).messages, yid)
-			await obj.set(newVid)
-
-	async def get_message_history(self, ctx: commands.Context, channel: discord.TextChannel):
-		await self.config.channel(channel).messages.set({})
+		self.stats.incr('messages')
+		if not (yids := self.get_yids(message)):
+			return
+
+		with self.stats.timer("config"):
+			scope = await self.get_scope(message.channel)
+			# while a backfill rebuilds the index, it has to see live links too, or its next commit drops them
+			if (messages := self.backfill_indexes.get(scope)) is None:
+				messages = await self.get_index(scope)
+		for yid in yids:
+			entry = await self.process_vid(yid, message, messages)
+			with self.stats.timer("config"):
+				await self.set_entry(scope, yid, entry)
+
+	async def get_scope(self, channel: discord.TextChannel) -> str:
+		"""Return the key of the index a channel shares with other channels."""
+		scope = await self.config.guild(channel.guild).scope()
+		if scope == "guild":
+			return f"guild-{channel.guild.id}"
+		if scope == "group" and (group := await self.config.channel(channel).group()):
+			return f"group-{channel.guild.id}-{group}"
+		return str(channel.id)
+
+	async def get_scopes(self) -> set:
+		return {await self.get_scope(channel) for chan in await self.config.all_channels() if (channel := self.bot.get_channel(chan))}
+
+	async def get_index(self, scope: str) -> MutableMapping:
+		"""Return the link history of a scope from the configured storage."""
+		if self.compact:
+			return self.compact.get(scope)
+		if scope.isdigit():
+			return await self.config.channel_from_id(int(scope)).messages()
+		return await self.config.custom("index", scope).messages()
+
+	async def set_index(self, scope: str, messages: MutableMapping) -> None:
+		"""Replace the link history of a scope."""
+		if self.compact:
+			await self.compact.set(scope, messages)
+			return self.schedule_flush()
+		if scope.isdigit():
+			return await self.config.channel_from_id(int(scope)).messages.set(messages)
+		await self.config.custom("index", scope).messages.set(messages)
+
+	async def set_entry(self, scope: str, yid: str, entry: dict) -> None:
+		"""Persist a single entry of the link history, which `process_vid` has already stored in the index."""
+		if self.compact:
+			return self.schedule_flush()
+		if scope.isdigit():
+			return await getattr(self.config.channel_from_id(int(scope)).messages, yid).set(entry)
+		await getattr(self.config.custom("index", scope).messages, yid).set(entry)
+
+	async def clear_index(self, scope: str) -> None:
+		if self.compact:
+			self.compact.clear(scope)
+		if scope.isdigit():
+			return await self.config.channel_from_id(int(scope)).messages.set({})
+		await self.config.custom("index", scope).clear()
+
+	async def forget_channel(self, scope: str, channel_id: int) -> None:
+		"""Remove the links of a channel from a shared index it is no longer part of."""
+		if (messages := self.backfill_indexes.get(scope)) is not None:
+			for yid in [yid for yid, entry in messages.items() if entry.get('chan') == channel_id]:
+				del messages[yid]
+		messages = await self.get_index(scope)
+		kept = {yid: entry for yid, entry in messages.items() if entry.get('chan') != channel_id}
+		if len(kept) != len(messages):
+			await self.set_index(scope, kept)
+
+	def schedule_flush(self) -> None:
+		if not self.flush_task:
+			self.flush_task = asyncio.create_task(self.flush_compact())
+
+	async def flush_compact(self) -> None:
+		try:
+			await asyncio.sleep(FLUSH_DELAY)
+			if self.compact:
+				await self.compact.flush()
+		finally:
+			self.flush_task = None
+
+	async def process_vid(self, yid: str, message: discord.Message, messages: MutableMapping) -> dict:
+		"""Check a video against the index, remove the duplicate and record the newest post."""
+		channel = message.channel
+		self.stats.incr('links')
+		if (previous := messages.get(yid)) and previous.get('msg', 0) >= message.id:
+			# a backfill reached this or an older post after a newer one was handled live
+			return previous
+		if previous:
+			self.stats.incr('duplicates')
+			if message.author.bot:
+				prevChannel = self.bot.get_channel(previous.get('chan') or channel.id)
+				# the original can be left in a channel that was unwatched after it was posted
+				if prevChannel and prevChannel.id in await self.get_watched() and prevChannel.permissions_for(prevChannel.guild.me).manage_messages:
+					self.queue_deletion(prevChannel.get_partial_message(previous.get('msg')))
+			elif channel.permissions_for(message.guild.me).manage_messages:
+				self.queue_deletion(message, await self.config.guild(channel.guild).notify())
+
+		messages[yid] = {
+			'msg': message.id,
+			'chan': channel.id,
+			'time': int(message.created_at.timestamp())
+		}
+		return messages[yid]
+
+	def queue_deletion(self, message: discord.Message, notify: bool = False) -> None:
+		"""Queue a message for deletion, so deletions in a channel can be coalesced into bulk calls."""
+		channel = message.channel
+		self.deletion_queue.setdefault(channel.id, {})[message.id] = message
+		if notify:
+			self.notice_queue.setdefault(channel.id, {})[message.author.id] = message.author
+		if channel.id not in self.deletion_tasks:
+			self.deletion_tasks[channel.id] = asyncio.create_task(self.flush_deletions(channel))
+
+	async def flush_deletions(self, channel: discord.TextChannel) -> None:
+		try:
+			await asyncio.sleep(DELETE_DELAY)
+			while pending := self.deletion_queue.pop(channel.id, None):
+				with self.stats.timer("deletion"):
+					cutoff = discord.utils.utcnow() - BULK_DELETE_AGE
+					recent = [msg for msg in pending.values() if msg.created_at > cutoff]
+					single = [msg for msg in pending.values() if msg.created_at <= cutoff]
+					for i in range(0, len(recent), 100):
+						try:
+							await channel.delete_messages(recent[i:i + 100])
+							self.stats.incr('deleted', len(recent[i:i + 100]))
+						except discord.HTTPException:
+							single.extend(recent[i:i + 100])
+
+					for msg in single:
+						with contextlib.suppress(discord.HTTPException):
+							await msg.delete()
+							self.stats.incr('deleted')
+				await self.send_notices(channel)
+		finally:
+			self.deletion_tasks.pop(channel.id, None)
+
+	async def send_notices(self, channel: discord.TextChannel) -> None:
+		"""Warn the senders of deleted links, at most once per user per `NOTICE_WINDOW` seconds."""
+		now = time.monotonic()
+		self.notified = {k: v for k, v in self.notified.items() if now - v < NOTICE_WINDOW}
+		users = [user for user in self.notice_queue.pop(channel.id, {}).values() if (channel.id, user.id) not in self.notified]
+		if not users:
+			return
+
+		for user in users:
+			self.notified[(channel.id, user.id)] = now
+		if len(users) == 1:
+			txt = _("Hello {name}. I have deleted your link, as it was already posted here recently.").format(name=users[0].mention)
+		else:
+			txt = _("Hello {names}. I have deleted your links, as they were already posted here recently.").format(names=humanize_list([user.mention for user in users]))
+		with contextlib.suppress(discord.HTTPException):
+			await channel.send(content=warning(txt), delete_after=10)
+
+	async def get_message_history(self, ctx: commands.Context, channels: list) -> None:
+		"""Backfill the indexes of several channels concurrently, reporting progress along the way.
+
+		All watched channels sharing an index with one of the given channels are backfilled as well."""
+		if not channels:
+			return
+
+		scopes = {}
+		for channel in channels:
+			scopes.setdefault(await self.get_scope(channel), set()).add(channel)
+		watched = await self.config.all_channels()
+		for channel in [x for x in ctx.guild.text_channels if x.id in watched]:
+			if (scope := await self.get_scope(channel)) in scopes:
+				scopes[scope].add(channel)
+
 		days = await self.config.guild(ctx.guild).history()
-		async with ctx.typing():
-			async for message in channel.history(after=datetime.now() - timedelta(days=days), limit=None):
-				await self.process_message(message)
+		progress = {channel: 0 for scope in scopes.values() for channel in scope}
+		status = await ctx.send(self.backfill_status(progress))
+		edited = time.monotonic()
+
+		async def report(counts: dict) -> None:
+			# concurrent backfills share the status message, so it is edited at most once per interval
+			nonlocal edited
+			progress.update(counts)
+			if time.monotonic() - edited >= BACKFILL_REPORT_INTERVAL:
+				edited = time.monotonic()
+				with contextlib.suppress(discord.HTTPException):
+					await status.edit(content=self.backfill_status(progress))
+
+		tasks = [self.start_backfill(scope, list(chans), days, report) for scope, chans in scopes.items()]
+		results = await asyncio.gather(*tasks, return_exceptions=True)
+		failed = {}
+		for chans, result in zip(scopes.values(), results):
+			if isinstance(result, asyncio.CancelledError):
+				failed.update(dict.fromkeys(chans, _("cancelled")))
+			elif isinstance(result, BaseException):
+				failed.update(dict.fromkeys(chans, str(result) or type(result).__name__))
+		with contextlib.suppress(discord.HTTPException):
+			await status.edit(content=self.backfill_status(progress, done=True, failed=failed))
+
+	def backfill_status(self, progress: dict, done: bool = False, failed: Optional[dict] = None) -> str:
+		failed = failed or {}
+		lines = [_("Scanned {count} messages in {channel}.").format(count=count, channel=channel.mention) for channel, count in progress.items() if channel not in failed]
+		lines += [_("Failed to scan {channel}: {reason}").format(channel=channel.mention, reason=reason) for channel, reason in failed.items()]
+		if not done:
+			header = _("Loading message history…")
+		elif failed:
+			header = _("Message history could not be loaded for all channels.")
+		else:
+			header = _("Message history has been loaded.")
+		return "\n".join([header] + lines)
+
+	def start_backfill(self, scope: str, channels: list, days: int, report: Optional[Callable] = None, resume: bool = False) -> asyncio.Task:
+		if task := self.backfills.get(scope):
+			task.cancel()
+		task = asyncio.create_task(self.backfill(scope, channels, days, report, resume))
+		self.backfills[scope] = task
+		task.add_done_callback(lambda t: self.backfill_done(scope, t))
+		return task
+
+	def backfill_done(self, scope: str, task: asyncio.Task) -> None:
+		if self.backfills.get(scope) is task:
+			del self.backfills[scope]
+		if not task.cancelled() and (exc := task.exception()):
+			log.error("Backfill of %s failed", scope, exc_info=exc)
+
+	async def backfill(self, scope: str, channels: list, days: int, report: Optional[Callable] = None, resume: bool = False) -> None:
+		"""Rebuild the index of a scope in memory while streaming the history of its channels.
+
+		The index and a cursor per channel are committed every `BACKFILL_CHECKPOINT` messages, so an interrupted backfill resumes where it left off.
+		Links posted meanwhile are recorded in the same index, so commits don't drop them."""
+		async with self.backfill_semaphore:
+			messages = dict(await self.get_index(scope)) if resume else {}
+			self.backfill_indexes[scope] = messages
+			try:
+				if not resume:
+					cursor = discord.utils.time_snowflake(datetime.now() - timedelta(days=days))
+					for channel in channels:
+						await self.config.channel(channel).messages.set({})
+						await self.config.channel(channel).backfill.set(cursor)
+					self.watched = None
+					await self.set_index(scope, messages)
+
+				cursors = {}
+				for channel in channels:
+					if cursor := await self.config.channel(channel).backfill():
+						cursors[channel] = cursor
+
+				# channels sharing an index are scanned together in posting order, so the oldest post of a video is always kept
+				counts = dict.fromkeys(cursors, 0)
+				latest = {}
+				async for message in self.merged_history(cursors):
+					for yid in self.get_yids(message):
+						await self.process_vid(yid, message, messages)
+					counts[message.channel] += 1
+					latest[message.channel] = message.id
+					if sum(counts.values()) % BACKFILL_CHECKPOINT == 0:
+						await self.set_index(scope, messages)
+						for channel, cursor in latest.items():
+							await self.config.channel(channel).backfill.set(cursor)
+						latest = {}
+						if report:
+							await report(counts)
+
+				await self.set_index(scope, messages)
+				for channel in counts:
+					await self.config.channel(channel).backfill.clear()
+				if report:
+					await report(counts)
+			finally:
+				if self.backfill_indexes.get(scope) is messages:
+					del self.backfill_indexes[scope]
+
+	async def merged_history(self, cursors: dict) -> AsyncIterator[discord.Message]:
+		"""Yield the messages of several channels after their cursors, merged in snowflake order."""
+		iterators = [channel.history(after=discord.Object(id=cursor), limit=None, oldest_first=True) for channel, cursor in cursors.items()]
+		heap = []
+		for i, iterator in enumerate(iterators):
+			with contextlib.suppress(StopAsyncIteration):
+				message = await iterator.__anext__()
+				heap.append((message.id, i, message))
+		heapq.heapify(heap)
+		while heap:
+			_id, i, message = heap[0]
+			yield message
+			try:
+				message = await iterators[i].__anext__()
+				heapq.heapreplace(heap, (message.id, i, message))
+			except StopAsyncIteration:
+				heapq.heappop(heap)
 
-	def get_yid(self, url: str):
-		query = urlparse(url)
-		if query.hostname == 'youtu.be': return query.path[1:]
-		if query.hostname in {'www.youtube.com', 'youtube.com', 'music.youtube.com'}:
-			if query.path == '/watch':
-				return parse_qs(query.query)['v'][0]
-			elif query.path.startswith(('/watch/', '/shorts/', '/live/', '/embed/', '/v/')):
-				return query.path.split('/')[2]
-		return None
+	def get_yids(self, message: discord.Message) -> list:
+		"""Return the distinct YouTube video IDs linked in a message."""
+		return list(dict.fromkeys(yid for host, yid in find_links(message) if yid))
 
 	async def red_delete_data_for_user(self, **kwargs) -> None:
 		pass
 
 	def cog_unload(self):
 		self.background_clean.cancel()
+		for task in [*self.backfills.values(), *self.deletion_tasks.values()]:
+			task.cancel()
+		if self.flush_task:
+			self.flush_task.cancel()
+		if self.compact:
+			self.compact.flush_sync()